@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Benchmark for `G68TransactionWriter.serialize_transaction`
+#
+# Compares the writer (which uses the compiled `G68LineSerializer`) against
+# building a `G68Transaction` from `Field` instances, which is how the writer
+# used to work, and against the columnar `G68TransactionWriter.serialize_columns`.
+# Run from the repository root:
+#
+#     PYTHONPATH=src python benchmarks/bench_g68.py [number of transactions]
+
+import sys
+import timeit
+from datetime import date
+
+from tenQ.writer.g68 import (
+    BetalingstekstLinje,
+    Fakturanummer,
+    G68Transaction,
+    G68TransactionWriter,
+    Posteringsdato,
+    Transaktionstype,
+    TransaktionstypeEnum,
+    Udbetalingsbeløb,
+    Udbetalingsberettiget,
+    UdbetalingsberettigetIdentKode,
+    UdbetalingsberettigetIdentKodeEnum,
+    Udbetalingsdato,
+)
+
+
+def serialize_fields(writer: G68TransactionWriter, *args) -> str:
+    (
+        transaction_type,
+        recipient_type,
+        recipient,
+        amount,
+        payment_date,
+        posting_date,
+        invoice_no,
+        text,
+    ) = args
+    line = G68Transaction(
+        writer,
+        Transaktionstype(transaction_type),
+        UdbetalingsberettigetIdentKode(recipient_type),
+        Udbetalingsberettiget(int(recipient)),
+        Udbetalingsbeløb(amount),
+        Udbetalingsdato(payment_date),
+        Posteringsdato(posting_date),
+        Fakturanummer(invoice_no),
+        BetalingstekstLinje.list_from_text(text),
+    ).serialized_value
+    writer.reset_line_number(writer.line_no + 1)
+    return line
+
+
+def main(count: int):
+    # Line numbers are at most 5 digits
+    count = min(count, 99999)
+    rows = [
+        (
+            TransaktionstypeEnum.AndenDestinationTilladt,
+            UdbetalingsberettigetIdentKodeEnum.CPR,
+            str(1000000000 + i),
+            i % 5000,
+            date(2020, 1, 27),
+            date(2020, 2, 1),
+            str(i),
+            "Udbetaling af beskæftigelsestilskud\nfor januar 2020",
+        )
+        for i in range(count)
+    ]
+    writer = G68TransactionWriter(0, 0)
+
+    for row in rows[:1000]:
+        expected = serialize_fields(writer, *row)
+        writer.reset_line_number(writer.line_no - 1)
+        assert writer.serialize_transaction(*row) == expected
+
+    columns = list(zip(*rows))
+    writer.reset_line_number()
+    expected = [serialize_fields(writer, *row) for row in rows[:1000]]
+    writer.reset_line_number()
+    assert writer.serialize_columns(*columns)[:1000] == expected
+
+    def run_columns():
+        writer.reset_line_number()
+        return writer.serialize_columns(*columns)
+
+    def run(serialize):
+        writer.reset_line_number()
+        return [serialize(*row) for row in rows]
+
+    for name, func in (
+        ("fields", lambda: run(lambda *row: serialize_fields(writer, *row))),
+        ("writer", lambda: run(writer.serialize_transaction)),
+        ("columns", run_columns),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(
+            f"{name:>10}: {seconds:.3f}s for {count} transactions "
+            f"({count / seconds:,.0f} transactions/s)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 99999)
@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Benchmark for `G69TransactionWriter`
+#
+# Compares serializing transactions (and debit/credit pairs) one at a time
+# against the columnar `G69TransactionWriter.serialize_columns`.
+# Run from the repository root:
+#
+#     PYTHONPATH=src python benchmarks/bench_g69.py [number of transactions]
+
+import sys
+import timeit
+from datetime import date
+from decimal import Decimal
+
+from tenQ.writer import G69TransactionWriter
+
+
+def main(count: int):
+    rows = [
+        {
+            "maskinnr": 123,
+            "eks_løbenr": i,
+            "post_dato": date(2022, 3, 11),
+            "kontonr": 1234005678,
+            "beløb": Decimal(i % 5000) / 7,
+            "is_debet": True,
+            "posteringstekst": f"Postering {i}",
+        }
+        for i in range(count)
+    ]
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    writer = G69TransactionWriter(12, 34)
+
+    def run(func):
+        def inner():
+            writer.reset_line_number()
+            return func()
+
+        return inner
+
+    single = run(lambda: [writer.serialize_transaction(**row) for row in rows])
+    pairs = run(lambda: [writer.serialize_transaction_pair(**row) for row in rows])
+    single_columns = run(lambda: writer.serialize_columns(columns))
+    pair_columns = run(lambda: writer.serialize_columns(columns, pairs=True))
+    assert single_columns() == single()
+    assert pair_columns() == pairs()
+
+    for name, func in (
+        ("rows", single),
+        ("columns", single_columns),
+        ("row pairs", pairs),
+        ("col. pairs", pair_columns),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(
+            f"{name:>10}: {seconds:.3f}s for {count} transactions "
+            f"({count / seconds:,.0f} transactions/s)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
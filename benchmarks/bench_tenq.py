@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Benchmark for `TenQTransactionWriter.serialize_transaction`
+#
+# Compares the writer against serializing each line with
+# `TenQTransaction.serialize_transaction`, which is how the writer used to work,
+# and against the columnar `TenQTransactionWriter.serialize_columns`.
+# Run from the repository root:
+#
+#     PYTHONPATH=src python benchmarks/bench_tenq.py [number of transactions]
+
+import sys
+import timeit
+from datetime import date, datetime, timezone
+
+from tenQ.writer.tenq import TenQTransaction, TenQTransactionWriter
+
+
+def serialize_per_field(writer: TenQTransactionWriter, rate_text: str, **kwargs):
+    data = {
+        "cpr_nummer": kwargs["cpr_nummer"],
+        "rate_beloeb": TenQTransaction.format_amount(kwargs["amount_in_dkk"] * 100),
+        "afstem_noegle": kwargs["afstem_noegle"],
+        "sag_nummer": TenQTransaction.format_nummer(0, 2),
+        "individ_type": TenQTransaction.format_nummer(20, 2),
+        "rate_nummer": TenQTransaction.format_nummer(999, 3),
+        "belob_type": 1,
+        "rentefri_beloeb": TenQTransaction.format_amount(0),
+        "opkraev_kode": 1,
+        "ean_lokationsnummer": "",
+    }
+    result_lines = [
+        writer.transaction_10.serialize_transaction(**data),
+        writer.transaction_24.serialize_transaction(**data),
+    ]
+    for line_nr, line in enumerate(rate_text.splitlines(), 1):
+        result_lines.append(
+            writer.transaction_26.serialize_transaction(
+                line_number=str(line_nr).rjust(3, "0"), rate_text=line, **data
+            ),
+        )
+    return "\r\n".join(result_lines)
+
+
+def main(count: int):
+    writer = TenQTransactionWriter(
+        due_date=date(2022, 2, 18),
+        year=2022,
+        leverandoer_ident="10Q",
+        timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+    )
+    rows = [
+        {
+            "cpr_nummer": str(1000000000 + i),
+            "amount_in_dkk": i % 5000 - 1000,
+            "afstem_noegle": f"{i:032x}",
+            "rate_text": "Restskat for 2022\r\nBetales senest 20. maj",
+        }
+        for i in range(count)
+    ]
+
+    for row in rows[:1000]:
+        assert writer.serialize_transaction(**row) == serialize_per_field(writer, **row)
+
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    assert writer.serialize_columns(**columns)[:1000] == [
+        writer.serialize_transaction(**row) for row in rows[:1000]
+    ]
+
+    for name, func in (
+        ("per field", lambda: [serialize_per_field(writer, **row) for row in rows]),
+        ("writer", lambda: [writer.serialize_transaction(**row) for row in rows]),
+        ("columns", lambda: writer.serialize_columns(**columns)),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(
+            f"{name:>10}: {seconds:.3f}s for {count} transactions "
+            f"({count / seconds:,.0f} transactions/s)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Allocation benchmark for `TenQTransactionWriter`
+#
+# Measures, with `tracemalloc`, the memory taken by a batch of pending
+# transactions held as dicts and as `TenQRow` tuples, and the memory allocated
+# while serializing the batch one transaction at a time.
+# Run from the repository root:
+#
+#     PYTHONPATH=src python benchmarks/bench_tenq_memory.py [number of transactions]
+
+import sys
+import tracemalloc
+from datetime import date, datetime, timezone
+
+from tenQ.writer.tenq import TenQRow, TenQTransactionWriter
+
+
+def traced(func):
+    """Call `func`, returning its result, the memory still held by objects it
+    allocated, and the peak memory allocated while it ran
+    """
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def make_dicts(count: int):
+    return [
+        {
+            "cpr_nummer": str(1000000000 + i),
+            "amount_in_dkk": i % 5000 - 1000,
+            "afstem_noegle": f"{i:032x}",
+            "rate_text": "Restskat for 2022\r\nBetales senest 20. maj",
+        }
+        for i in range(count)
+    ]
+
+
+def make_rows(count: int):
+    return [
+        TenQRow(
+            str(1000000000 + i),
+            i % 5000 - 1000,
+            f"{i:032x}",
+            "Restskat for 2022\r\nBetales senest 20. maj",
+        )
+        for i in range(count)
+    ]
+
+
+def main(count: int):
+    writer = TenQTransactionWriter(
+        due_date=date(2022, 2, 18),
+        year=2022,
+        leverandoer_ident="10Q",
+        timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+    )
+    # Compile the serializers outside of the measurements
+    writer.serialize_transaction("0", 0, "", "")
+
+    dicts, dicts_size, _ = traced(lambda: make_dicts(count))
+    rows, rows_size, _ = traced(lambda: make_rows(count))
+    assert list(writer.serialize_transactions(dicts)) == list(
+        writer.serialize_transactions(rows)
+    )
+    print(f"{'pending dicts':>16}: {dicts_size / count:6.0f} bytes/transaction")
+    print(f"{'pending rows':>16}: {rows_size / count:6.0f} bytes/transaction")
+
+    def serialize(batch):
+        for _ in writer.serialize_transactions(batch):
+            pass
+
+    for name, batch in (("serialize dicts", dicts), ("serialize rows", rows)):
+        _, _, peak = traced(lambda: serialize(batch))
+        print(f"{name:>16}: {peak:6d} bytes peak for {count} transactions")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,217 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Streaming group-by aggregation of amounts in 10Q, G68 and G69 files.
+#
+# Each file is read line by line, and only the key fields and the amount are
+# sliced out of each line. Amounts are summed in øre, as they are written in
+# the files, and the number of lines (records) is counted per key. Partial
+# aggregates (e.g. from several files, or from worker processes) can be
+# combined with `Aggregate.update` or `+`.
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tenQ.writer.encoding import PRISME_ENCODING
+from tenQ.writer.g68 import (
+    FloatingFieldMixin,
+    Fortegnsmarkering,
+    G68TransactionView,
+    Udbetalingsbeløb,
+)
+from tenQ.writer.g69 import G69TransactionWriter
+from tenQ.writer.tenq import TenQFixWidthFieldLineTransactionType24, TenQTransaction
+
+Key = Tuple[str, ...]
+
+
+class Aggregate:
+    """Sum of amounts (in øre) and number of records for each key.
+    A key is a tuple of the (stripped) values of the fields in `by`.
+    """
+
+    def __init__(self, by: Sequence[str]):
+        self.by = tuple(by)
+        # key -> [amount, count]
+        self.totals: Dict[Key, List[int]] = {}
+
+    def add(self, key: Key, amount: int, count: int = 1):
+        totals = self.totals.get(key)
+        if totals is None:
+            self.totals[key] = [amount, count]
+        else:
+            totals[0] += amount
+            totals[1] += count
+
+    def update(self, other: "Aggregate"):
+        if other.by != self.by:
+            raise ValueError(f"Cannot combine aggregates by {self.by} and {other.by}")
+        for key, (amount, count) in other.totals.items():
+            self.add(key, amount, count)
+
+    def __add__(self, other: "Aggregate") -> "Aggregate":
+        result = Aggregate(self.by)
+        result.update(self)
+        result.update(other)
+        return result
+
+    @classmethod
+    def combine(cls, aggregates: Iterable["Aggregate"]) -> "Aggregate":
+        result: Optional[Aggregate] = None
+        for aggregate in aggregates:
+            if result is None:
+                result = cls(aggregate.by)
+            result.update(aggregate)
+        if result is None:
+            raise ValueError("No aggregates to combine")
+        return result
+
+    def amount(self, key: Key) -> int:
+        return self.totals[key][0]
+
+    def count(self, key: Key) -> int:
+        return self.totals[key][1]
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Aggregate):
+            return NotImplemented
+        return self.by == other.by and self.totals == other.totals
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: by {self.by}, {len(self)} keys>"
+
+
+def _floating_raw(line: str, marker: str) -> Optional[str]:
+    # Value of the floating field starting with `marker` (e.g. "&08"), or None.
+    # Field values cannot contain "&", so the marker can only match a field.
+    start = line.find(marker)
+    if start == -1:
+        return None
+    start += len(marker)
+    end = line.find("&", start)
+    return line[start:] if end == -1 else line[start:end]
+
+
+def aggregate_10q_file(
+    filename: str,
+    by: Sequence[str] = ("debitor_nummer",),
+    amount_field: str = "rate_beloeb",
+    aggregate: Optional[Aggregate] = None,
+    encoding: str = PRISME_ENCODING,
+) -> Aggregate:
+    """Sum `amount_field` from the type 24 lines of a 10Q file, grouped by the
+    fields in `by` (which must be fields of the type 24 line, e.g.
+    "debitor_nummer", "omraade_nummer", "paalign_aar" or "betal_art".)
+    Pass `aggregate` to add to an existing aggregate. The file is decoded with
+    `encoding`, which defaults to the encoding of the writers' binary output.
+    """
+    if aggregate is None:
+        aggregate = Aggregate(by)
+    slices = TenQFixWidthFieldLineTransactionType24.field_slices()
+    try:
+        key_slices = [slices[name] for name in by]
+        amount_slice = slices[amount_field]
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]} is not a field of type 24 lines")
+    parse_amount = TenQTransaction.parse_amount
+    add = aggregate.add
+    with open(filename, "r", encoding=encoding) as fp:
+        for line in fp:
+            if line[4:6] == "24":
+                add(
+                    tuple([line[slc].strip() for slc in key_slices]),
+                    parse_amount(line[amount_slice]),
+                )
+    return aggregate
+
+
+def aggregate_g68_file(
+    filename: str,
+    by: Sequence[str] = ("Udbetalingsberettiget",),
+    aggregate: Optional[Aggregate] = None,
+    encoding: str = PRISME_ENCODING,
+) -> Aggregate:
+    """Sum the amounts (`Udbetalingsbeløb` with the sign in `Fortegnsmarkering`)
+    of the lines in a G68 file, grouped by the fields in `by`. Fields are given
+    by `Field` class name, e.g. "Udbetalingsberettiget" or "Transaktionstype".
+    See `aggregate_10q_file` for `aggregate` and `encoding`.
+    """
+    if aggregate is None:
+        aggregate = Aggregate(by)
+    id_length = FloatingFieldMixin._id_length
+    # Each key field is either a fixed field (a slice) or a floating field (a marker)
+    keys: List = []
+    for name in by:
+        if name in G68TransactionView._fixed:
+            keys.append(G68TransactionView._fixed[name][1])
+            continue
+        for field_id, cls in FloatingFieldMixin._id_cls_map.items():
+            if cls.__name__ == name:
+                keys.append(f"&{str(field_id).zfill(id_length)}")
+                break
+        else:
+            raise ValueError(f"{name} is not a G68 field")
+    amount_marker = f"&{str(Udbetalingsbeløb.id).zfill(id_length)}"
+    sign_marker = f"&{str(Fortegnsmarkering.id).zfill(id_length)}"
+    add = aggregate.add
+    with open(filename, "r", encoding=encoding) as fp:
+        for line in fp:
+            line = line.rstrip("\n")
+            amount = _floating_raw(line, amount_marker)
+            if amount is None:
+                continue
+            key = tuple(
+                [
+                    (
+                        _floating_raw(line, k) or ""
+                        if isinstance(k, str)
+                        else line[k].strip()
+                    )
+                    for k in keys
+                ]
+            )
+            if _floating_raw(line, sign_marker) == "-":
+                add(key, -int(amount))
+            else:
+                add(key, int(amount))
+    return aggregate
+
+
+def aggregate_g69_file(
+    filename: str,
+    by: Sequence[str] = ("kontonr",),
+    aggregate: Optional[Aggregate] = None,
+    encoding: str = PRISME_ENCODING,
+) -> Aggregate:
+    """Sum the amounts (`beløb`) of the lines in a G69 file, grouped by the
+    fields in `by`, which are given by their names in
+    `G69TransactionWriter.fields` (e.g. "kontonr" or "deb_kred".)
+    Amounts keep the sign they are written with; group by "deb_kred" to get
+    separate totals for debit and credit.
+    See `aggregate_10q_file` for `aggregate` and `encoding`.
+    """
+    if aggregate is None:
+        aggregate = Aggregate(by)
+    fields = G69TransactionWriter.fields
+    try:
+        key_markers = [f"&{str(fields[name][0]).zfill(3)}" for name in by]
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]} is not a G69 field")
+    amount_marker = f"&{str(fields['beløb'][0]).zfill(3)}"
+    add = aggregate.add
+    with open(filename, "r", encoding=encoding) as fp:
+        for line in fp:
+            line = line.rstrip("\n")
+            amount = _floating_raw(line, amount_marker)
+            if amount is None:
+                continue
+            key = tuple([_floating_raw(line, m) or "" for m in key_markers])
+            # Amounts are written as øre followed by "-" or " "
+            if amount[-1:] == "-":
+                add(key, -int(amount[:-1]))
+            else:
+                add(key, int(amount))
+    return aggregate
@@ -0,0 +1,40 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Conversion between `date` objects and the YYYYMMDD strings used for dates in
+# the 10Q, G68 and G69 formats.
+
+from datetime import date
+from functools import lru_cache
+
+DATE_FORMAT = "%Y%m%d"
+
+# A file (or a batch run) typically only contains a handful of distinct dates,
+# so both directions are memoized.
+
+
+@lru_cache(maxsize=4096)
+def _format_date(d: date) -> str:
+    year = d.year
+    if year < 1000:
+        # Defer to `strftime`, whose (unpadded) output for these years
+        # depends on the platform
+        return d.strftime(DATE_FORMAT)
+    return f"{year}{d.month:02d}{d.day:02d}"
+
+
+def format_date(d: date) -> str:
+    """Format `d` as YYYYMMDD; the same as `d.strftime("%Y%m%d")`"""
+    if type(d) is date:
+        return _format_date(d)
+    # Subclasses (e.g. `datetime`) are usually unique, so they are not cached
+    return format(d, DATE_FORMAT)
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> date:
+    """Parse a YYYYMMDD string into a `date`"""
+    if len(value) != 8 or not (value.isascii() and value.isdigit()):
+        raise ValueError(f"{value!r} is not a date in the format YYYYMMDD")
+    return date(int(value[:4]), int(value[4:6]), int(value[6:]))
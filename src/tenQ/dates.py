@@ -4,7 +4,10 @@
 
 # Utility module containing date calculation methods for the 10Q format
 
+from array import array
 from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, Collection, Iterable, List, Optional, Set, Union
 
 # Dates for final statements and their charges are defined by law. This
 # module contains methods that makes it easy to calculate the dates correctly
@@ -41,10 +44,16 @@ def get_due_date(reference_date: date):
 
 # Last payment date is the first workday on or after the 20th in the same month
 # as the due date.
-def get_last_payment_date_from_due_date(due_date: date):
+def get_last_payment_date_from_due_date(
+    due_date: date, calendar: Optional["BusinessDayCalendar"] = None
+):
     # Always the 20th of same month
     result = due_date.replace(day=20)
 
+    if calendar is not None:
+        # Also skip the holidays of the calendar
+        return calendar.next_business_day(result)
+
     # Cannot pay on saturday on sunday, so add the needed days to
     # get to monday, if neccessary.
     if result.weekday() in (5, 6):
@@ -54,5 +63,206 @@ def get_last_payment_date_from_due_date(due_date: date):
     return result
 
 
-def get_last_payment_date(reference_date: date):
-    return get_last_payment_date_from_due_date(get_due_date(reference_date))
+def get_last_payment_date(
+    reference_date: date, calendar: Optional["BusinessDayCalendar"] = None
+):
+    return get_last_payment_date_from_due_date(get_due_date(reference_date), calendar)
+
+
+# Batch versions of the functions above, for computing the dates of many
+# reference dates at once. The results only depend on the year and month of
+# the input, so they are computed once per month by the scalar functions and
+# looked up for the rest.
+#
+# The inputs may be any iterable of dates, including NumPy `datetime64[D]`
+# arrays (which are converted with `tolist()`.) The results are lists of dates.
+
+
+@lru_cache(maxsize=1024)
+def _due_date_for_month(year: int, month: int) -> date:
+    return get_due_date(date(year, month, 1))
+
+
+@lru_cache(maxsize=1024)
+def _last_payment_date_for_month(year: int, month: int) -> date:
+    return get_last_payment_date_from_due_date(date(year, month, 1))
+
+
+def _as_dates(values: Iterable) -> Iterable:
+    tolist = getattr(values, "tolist", None)
+    return tolist() if tolist is not None else values
+
+
+def get_due_dates(reference_dates: Iterable[date]) -> List[date]:
+    return [
+        _due_date_for_month(reference_date.year, reference_date.month)
+        for reference_date in _as_dates(reference_dates)
+    ]
+
+
+def get_last_payment_dates_from_due_dates(
+    due_dates: Iterable[date], calendar: Optional["BusinessDayCalendar"] = None
+) -> List[date]:
+    if calendar is not None:
+        return [
+            calendar.next_business_day(due_date.replace(day=20))
+            for due_date in _as_dates(due_dates)
+        ]
+    return [
+        (
+            _last_payment_date_for_month(due_date.year, due_date.month)
+            if type(due_date) is date
+            # Subclasses such as `datetime` keep their type and time of day
+            else get_last_payment_date_from_due_date(due_date)
+        )
+        for due_date in _as_dates(due_dates)
+    ]
+
+
+def get_last_payment_dates(
+    reference_dates: Iterable[date], calendar: Optional["BusinessDayCalendar"] = None
+) -> List[date]:
+    if calendar is not None:
+        return get_last_payment_dates_from_due_dates(
+            get_due_dates(reference_dates), calendar
+        )
+    result = []
+    for reference_date in _as_dates(reference_dates):
+        due_date = _due_date_for_month(reference_date.year, reference_date.month)
+        result.append(_last_payment_date_for_month(due_date.year, due_date.month))
+    return result
+
+
+# Holidays, for use with `BusinessDayCalendar`. Only the holidays falling on
+# weekdays make a difference, since weekends are skipped anyway.
+
+
+def easter_sunday(year: int) -> date:
+    # Anonymous Gregorian algorithm (Meeus/Jones/Butcher)
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    ell = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * ell) // 451
+    month, day = divmod(h + ell - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def danish_holidays(year: int) -> Set[date]:
+    """Danish bank holidays (the days on which payments are not settled)"""
+    easter = easter_sunday(year)
+    holidays = {
+        date(year, 1, 1),  # Nytårsdag
+        easter - timedelta(days=3),  # Skærtorsdag
+        easter - timedelta(days=2),  # Langfredag
+        easter + timedelta(days=1),  # 2. påskedag
+        easter + timedelta(days=39),  # Kristi himmelfartsdag
+        easter + timedelta(days=40),  # Dagen efter Kristi himmelfartsdag
+        easter + timedelta(days=50),  # 2. pinsedag
+        date(year, 6, 5),  # Grundlovsdag
+        date(year, 12, 24),  # Juleaftensdag
+        date(year, 12, 25),  # Juledag
+        date(year, 12, 26),  # 2. juledag
+        date(year, 12, 31),  # Nytårsaftensdag
+    }
+    if year < 2024:
+        # Store bededag was abolished in Denmark from 2024
+        holidays.add(easter + timedelta(days=26))
+    return holidays
+
+
+def greenlandic_holidays(year: int) -> Set[date]:
+    """Greenlandic public holidays"""
+    easter = easter_sunday(year)
+    return {
+        date(year, 1, 1),  # Nytårsdag
+        easter - timedelta(days=3),  # Skærtorsdag
+        easter - timedelta(days=2),  # Langfredag
+        easter + timedelta(days=1),  # 2. påskedag
+        easter + timedelta(days=26),  # Store bededag
+        easter + timedelta(days=39),  # Kristi himmelfartsdag
+        easter + timedelta(days=50),  # 2. pinsedag
+        date(year, 6, 21),  # Nationaldag
+        date(year, 12, 24),  # Juleaftensdag
+        date(year, 12, 25),  # Juledag
+        date(year, 12, 26),  # 2. juledag
+        date(year, 12, 31),  # Nytårsaftensdag
+    }
+
+
+class BusinessDayCalendar:
+    """Lookup table of the next business day for each day in a date range.
+
+    A business day is a day which is neither in `weekend` (weekday numbers as
+    returned by `date.weekday()`) nor a holiday. `holidays` is either a
+    collection of dates, or a function returning the holidays of a given year
+    (such as `danish_holidays` or `greenlandic_holidays`.)
+
+    The table is computed once, so a calendar can be shared by any number of
+    writers and lookups are a single array index.
+    """
+
+    def __init__(
+        self,
+        start: date,
+        end: date,
+        holidays: Union[Collection[date], Callable[[int], Iterable[date]]] = (),
+        weekend: Collection[int] = (5, 6),
+    ):
+        if end < start:
+            raise ValueError(f"Calendar ends ({end}) before it starts ({start})")
+        if len(set(weekend) & set(range(7))) == 7:
+            raise ValueError("A calendar needs at least one business day per week")
+        if callable(holidays):
+            # Include the following year, which the last days may roll over into
+            holidays = {
+                day
+                for year in range(start.year, min(end.year + 1, 9999) + 1)
+                for day in holidays(year)
+            }
+        holiday_ordinals = {day.toordinal() for day in holidays}
+        weekend = frozenset(weekend)
+
+        def is_business_day(ordinal: int) -> bool:
+            return (
+                ordinal not in holiday_ordinals
+                and (ordinal + 6) % 7 not in weekend  # Same as date.weekday()
+            )
+
+        self.start = start
+        self.end = end
+        self._first = start.toordinal()
+        last = end.toordinal()
+        # Find the next business day of the last day, then fill in backwards
+        next_ordinal = last
+        while not is_business_day(next_ordinal):
+            next_ordinal += 1
+        table = array("i", [0]) * (last - self._first + 1)
+        for ordinal in range(last, self._first - 1, -1):
+            if is_business_day(ordinal):
+                next_ordinal = ordinal
+            table[ordinal - self._first] = next_ordinal
+        self._table = table
+
+    def _next_ordinal(self, day: date) -> int:
+        index = day.toordinal() - self._first
+        if not 0 <= index < len(self._table):
+            raise ValueError(
+                f"{day} is outside the calendar range {self.start} - {self.end}"
+            )
+        return self._table[index]
+
+    def is_business_day(self, day: date) -> bool:
+        return self._next_ordinal(day) == day.toordinal()
+
+    def next_business_day(self, day: date) -> date:
+        """The first business day on or after `day`"""
+        days = self._next_ordinal(day) - day.toordinal()
+        return day + timedelta(days=days) if days else day
+
+    def last_payment_date(self, due_date: date) -> date:
+        return get_last_payment_date_from_due_date(due_date, self)
@@ -2,63 +2,434 @@
 #
 # SPDX-License-Identifier: MPL-2.0
 
+import json
+import os
 import sys
-from typing import Dict, List
+from datetime import date
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
 
 from openpyxl import Workbook
 
+from tenQ.datecodec import parse_date
+from tenQ.writer.encoding import PRISME_ENCODING
 from tenQ.writer.tenq import (
     TenQFixWidthFieldLineTransactionType10,
     TenQFixWidthFieldLineTransactionType24,
     TenQFixWidthFieldLineTransactionType26,
+    TenQFixWidthFieldLineTransactionType52,
+    TenQTransaction,
 )
 
 trans_type_map = {
     "10": TenQFixWidthFieldLineTransactionType10,
     "24": TenQFixWidthFieldLineTransactionType24,
     "26": TenQFixWidthFieldLineTransactionType26,
+    "52": TenQFixWidthFieldLineTransactionType52,
 }
 
+# Fields holding a date in the format YYYYMMDD
+date_fields = frozenset(
+    (
+        "opkraev_dato",
+        "forfald_dato",
+        "betal_dato",
+        "rentefri_dato",
+        "stiftelse_dato",
+        "fra_periode",
+        "til_periode",
+    )
+)
+
+
+# Fields which the writer zero-fills to their width
+zero_filled_fields = {"debitor_nummer": 10, "person_nummer": 10, "omraade_nummer": 3}
+
+
+def _parse_date(raw: str) -> Optional[date]:
+    # Blank fields have no date
+    return parse_date(raw) if raw.strip() else None
+
+
+class TenQLineView:
+    """Read-only view of a single line in a 10Q file.
+
+    The raw line is kept as-is, and each field is only sliced out of it when it
+    is accessed. Field names are the same as in the `fieldspec` of the matching
+    `TenQTransaction` subclass.
+    """
+
+    __slots__ = ("line", "trans_type", "_slices")
+
+    def __init__(self, line: str):
+        trans_type = line[4:6]
+        try:
+            self._slices = trans_type_map[trans_type].field_slices()
+        except KeyError:
+            raise ValueError(f"Unrecognized trans_type {trans_type}")
+        self.line = line
+        self.trans_type = trans_type
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._slices
+
+    def __getitem__(self, name: str) -> str:
+        return self.line[self._slices[name]]
+
+    def get_date(self, name: str) -> Optional[date]:
+        return _parse_date(self[name])
+
+    def keys(self):
+        return self._slices.keys()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: {self.line!r}>"
+
+
+class TenQRecordView:
+    """Read-only view of a type 10 block (the type 10 line and the 24/26/52 lines
+    following it) in a 10Q file.
+
+    Looking up a field returns the value from the last line in the block that
+    has it, which is the same value `read_10q_file` would put in its dict.
+    Values are cached per field once they have been looked up.
+    """
+
+    __slots__ = ("raw_lines", "line_numbers", "_slices", "_cache")
+
+    def __init__(self):
+        self.raw_lines: List[str] = []
+        self.line_numbers: List[int] = []
+        self._slices: List[Dict[str, slice]] = []
+        self._cache: Optional[Dict[str, str]] = None
+
+    def append(self, line: str, line_no: int):
+        trans_type = line[4:6]
+        try:
+            self._slices.append(trans_type_map[trans_type].field_slices())
+        except KeyError:
+            raise ValueError(f"Unrecognized trans_type {trans_type}")
+        self.raw_lines.append(line)
+        self.line_numbers.append(line_no)
+        self._cache = None
+
+    @property
+    def lines(self) -> List[TenQLineView]:
+        return [TenQLineView(line) for line in self.raw_lines]
+
+    def __getitem__(self, name: str):
+        if name == "10q_line_no":
+            return self.line_numbers
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        elif name in cache:
+            return cache[name]
+        if name != "trans_type":
+            for i in range(len(self.raw_lines) - 1, -1, -1):
+                slc = self._slices[i].get(name)
+                if slc is not None:
+                    value = cache[name] = self.raw_lines[i][slc]
+                    return value
+        raise KeyError(name)
+
+    def get(self, name: str, default: Optional[str] = None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def get_date(self, name: str, default: Optional[date] = None) -> Optional[date]:
+        raw = self.get(name)
+        if raw is None:
+            return default
+        return _parse_date(raw)
+
+    def as_dict(self, parse_dates: bool = False) -> Dict:
+        # Same keys, values and key order as the dicts from `read_10q_file`
+        data: Dict = {}
+        for line, slices in zip(self.raw_lines, self._slices):
+            for name, slc in slices.items():
+                data[name] = line[slc]
+            del data["trans_type"]
+            data.setdefault("10q_line_no", list(self.line_numbers))
+        if parse_dates:
+            for name in date_fields.intersection(data):
+                data[name] = _parse_date(data[name])
+        return data
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: lines {self.line_numbers}>"
+
+
+class FieldPredicate:
+    """Filter on the value of a single field in a 10Q record.
+
+    Predicates are called with the raw fixed-width value of the field, as it is
+    sliced from the line, so records can be rejected before anything else in
+    them is decoded. The value is taken from the last line in the record which
+    has the field (see `TenQRecordView`.)
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def __call__(self, raw: str) -> bool:
+        raise NotImplementedError("must be implemented by subclass")
 
-def read_10q_file(filename: str) -> List[Dict]:
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: {self.field}>"
 
-    with open(filename, "r") as fp:
-        line_no = 1
-        line_data = {}
-        all_line_data = []
-        for line in fp.readlines():
+
+class FieldIn(FieldPredicate):
+    """Matches records where `field` is one of `values`, ignoring padding,
+    e.g. `FieldIn("debitor_nummer", {"1234567890", "2345678901"})`
+
+    Values for the fields in `zero_filled_fields` are zero-filled like the
+    writer does, so `FieldIn("debitor_nummer", {123456789})` matches records
+    written with `cpr_nummer="123456789"`.
+    """
+
+    def __init__(self, field: str, values: Iterable):
+        super().__init__(field)
+        width = zero_filled_fields.get(field)
+        if width is None:
+            self.values = frozenset(str(value).strip() for value in values)
+        else:
+            self.values = frozenset(str(value).strip().zfill(width) for value in values)
+
+    def __call__(self, raw: str) -> bool:
+        return raw.strip() in self.values
+
+
+class FieldPrefix(FieldPredicate):
+    """Matches records where `field` starts with `prefix`, ignoring padding,
+    e.g. `FieldPrefix("afstem_noegle", "e688d6a6")`
+    """
+
+    def __init__(self, field: str, prefix: str):
+        super().__init__(field)
+        self.prefix = prefix
+
+    def __call__(self, raw: str) -> bool:
+        return raw.lstrip().startswith(self.prefix)
+
+
+class AmountRange(FieldPredicate):
+    """Matches records where the amount in `field` (in øre, as written in the
+    file) is between `minimum` and `maximum`, both inclusive. Either bound may be
+    left out.
+    """
+
+    def __init__(
+        self,
+        field: str = "rate_beloeb",
+        minimum: Optional[int] = None,
+        maximum: Optional[int] = None,
+    ):
+        super().__init__(field)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __call__(self, raw: str) -> bool:
+        amount = TenQTransaction.parse_amount(raw)
+        if self.minimum is not None and amount < self.minimum:
+            return False
+        if self.maximum is not None and amount > self.maximum:
+            return False
+        return True
+
+
+Predicate = Union[FieldPredicate, Callable[[TenQRecordView], bool]]
+
+
+def _matches(record: TenQRecordView, where: Iterable[Predicate]) -> bool:
+    for predicate in where:
+        if isinstance(predicate, FieldPredicate):
+            raw = record.get(predicate.field)
+            if raw is None or not predicate(raw):
+                return False
+        elif not predicate(record):
+            return False
+    return True
+
+
+def iter_10q_records(
+    filename: str,
+    where: Iterable[Predicate] = (),
+    trans_types: Optional[AbstractSet[str]] = None,
+    strict: bool = False,
+    encoding: str = PRISME_ENCODING,
+) -> Iterator[TenQRecordView]:
+    """Iterate over the type 10 blocks in a 10Q file without decoding them.
+    Fields are only decoded when they are looked up on the yielded views.
+
+    Only records matching all the predicates in `where` are yielded. These may
+    be `FieldPredicate` instances, which only look at a single raw field, or any
+    callable taking a `TenQRecordView`.
+    If `trans_types` is given, only lines of those types are kept in the records.
+    Lines with an unrecognized trans_type are skipped, or raise a ValueError if
+    `strict` is true.
+    The file is decoded with `encoding`, which defaults to the encoding the
+    writers use for binary output.
+    """
+    where = tuple(where)
+    with open(filename, "r", encoding=encoding) as fp:
+        record = None
+        for line_no, line in enumerate(fp, 1):
+            line = line.rstrip("\n")
             trans_type = line[4:6]
-            if trans_type in trans_type_map:
-                # Each time we encounter a type 10, start a new dict. Other lines update the previous dict
-                if trans_type == "10":
-                    if line_data:
-                        all_line_data.append(line_data)
-                    line_data = {}
-
-                # Get fieldspec based on trans_type
-                fieldspec = trans_type_map[trans_type].fieldspec
-
-                # Loop over field spec (it's an ordered tuple).
-                # Each field specifies its length, so the accumulated sum of lengths is the position we read from
-                pos = 0
-                for fieldname, fieldlength, default in fieldspec:
-                    if fieldname != "trans_type":  # Don't save trans_type
-                        line_data[fieldname] = line[pos : pos + fieldlength]
-                    pos += fieldlength
-
-                # Save line numbers
-                if "10q_line_no" not in line_data:
-                    line_data["10q_line_no"] = []
-                line_data["10q_line_no"].append(line_no)
-            else:
+            if trans_type not in trans_type_map:
+                if strict:
+                    raise ValueError(
+                        f"Unrecognized trans_type {trans_type} on line {line_no} "
+                        f"of {filename}"
+                    )
                 print(f"Unrecognized trans_type {trans_type} on line {line_no}")
-            line_no += 1
+                continue
+            # Each time we encounter a type 10, start a new record
+            if trans_type == "10" or record is None:
+                if record is not None and record.raw_lines and _matches(record, where):
+                    yield record
+                record = TenQRecordView()
+            if trans_types is None or trans_type in trans_types:
+                record.append(line, line_no)
+
+        # Last record
+        if record is not None and record.raw_lines and _matches(record, where):
+            yield record
+
+
+def read_10q_file(
+    filename: str,
+    where: Iterable[Predicate] = (),
+    trans_types: Optional[AbstractSet[str]] = None,
+    parse_dates: bool = False,
+    encoding: str = PRISME_ENCODING,
+) -> List[Dict]:
+    """Read a 10Q file into a list of dicts, one for each type 10 block.
+    See `iter_10q_records` for the meaning of `where`, `trans_types` and
+    `encoding`; records that do not match are skipped without building their
+    dicts.
+    With `parse_dates`, the values of the `date_fields` are `date` objects instead
+    of the raw YYYYMMDD strings.
+    """
+    return [
+        record.as_dict(parse_dates)
+        for record in iter_10q_records(filename, where, trans_types, encoding=encoding)
+    ]
+
+
+class TenQFileTail:
+    """Incremental reader for a 10Q file which is being appended to.
+
+    Each call to `read` resumes from where the previous call stopped, and only
+    yields the type 10 blocks which have been completed since then. A block is
+    complete once the next type 10 line has been written after it, or when
+    `read` is called with `final=True` (e.g. when the file has been closed for
+    the day.) Incomplete lines and blocks are left for the next call.
+
+    The position is stored as the byte offset and line number (`10q_line_no`)
+    of the first line which has not been consumed. If `state_filename` is
+    given, the position is loaded from and saved to that (JSON) file.
+    The file is decoded with `encoding`, which defaults to the encoding the
+    writers use for binary output.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        state_filename: Optional[str] = None,
+        encoding: str = PRISME_ENCODING,
+    ):
+        self.filename = filename
+        self.state_filename = state_filename
+        self.encoding = encoding
+        self.offset = 0
+        self.line_no = 0
+        if state_filename is not None and os.path.exists(state_filename):
+            self.load_state()
+
+    @property
+    def state(self) -> Dict[str, int]:
+        return {"offset": self.offset, "10q_line_no": self.line_no}
+
+    def load_state(self):
+        with open(self.state_filename, "r") as fp:  # type: ignore[arg-type]
+            state = json.load(fp)
+        self.offset = state["offset"]
+        self.line_no = state["10q_line_no"]
+
+    def save_state(self):
+        # Write to a temporary file first, so a crash never leaves a broken state
+        tmp_filename = f"{self.state_filename}.tmp"
+        with open(tmp_filename, "w") as fp:
+            json.dump(self.state, fp)
+        os.replace(tmp_filename, self.state_filename)  # type: ignore[arg-type]
+
+    def read(
+        self,
+        where: Iterable[Predicate] = (),
+        trans_types: Optional[AbstractSet[str]] = None,
+        final: bool = False,
+    ) -> Iterator[TenQRecordView]:
+        """Yield the records completed since the last call.
+        See `iter_10q_records` for the meaning of `where` and `trans_types`.
+        """
+        where = tuple(where)
+        with open(self.filename, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size < self.offset:
+                # The file has been truncated or replaced; start over
+                self.offset = 0
+                self.line_no = 0
+            fp.seek(self.offset)
+
+            offset = self.offset
+            line_no = self.line_no
+            record = None
+            for raw in fp:
+                if not raw.endswith(b"\n") and not final:
+                    # Incomplete line
+                    break
+                line = raw.decode(self.encoding).rstrip("\r\n")
+                trans_type = line[4:6]
+                if trans_type not in trans_type_map:
+                    print(f"Unrecognized trans_type {trans_type} on line {line_no + 1}")
+                elif trans_type == "10" or record is None:
+                    if record is not None:
+                        # The previous record is complete
+                        self.offset = offset
+                        self.line_no = line_no
+                        if record.raw_lines and _matches(record, where):
+                            yield record
+                    record = TenQRecordView()
+                offset += len(raw)
+                line_no += 1
+                if record is None:
+                    # Nothing pending, so the line has been consumed
+                    self.offset = offset
+                    self.line_no = line_no
+                elif trans_type in trans_type_map and (
+                    trans_types is None or trans_type in trans_types
+                ):
+                    record.append(line, line_no)
 
-        # Last instance of line_data
-        if line_data:
-            all_line_data.append(line_data)
+            if final:
+                self.offset = offset
+                self.line_no = line_no
+                if record is not None and record.raw_lines and _matches(record, where):
+                    yield record
 
-    return all_line_data
+        if self.state_filename is not None:
+            self.save_state()
 
 
 def save_to_excel(data: List[Dict], filename: str):
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Sorting and merging of 10Q files which are too large to be read into memory.
+#
+# Records (a type 10 line and the 24/26/52 lines following it) are always kept
+# together. Records are read in bounded-size runs, each run is sorted and
+# written to a temporary file, and the runs are then merged with a heap-based
+# k-way merge (`heapq.merge`.) Records with the same key keep their input order.
+
+import heapq
+import os
+import tempfile
+from typing import Callable, Iterable, Iterator, List, TextIO
+
+from tenQ.reader import TenQRecordView, iter_10q_records
+from tenQ.writer.encoding import PRISME_ENCODING
+
+
+def _sort_key(key: str) -> Callable[[TenQRecordView], str]:
+    def get_key(record: TenQRecordView) -> str:
+        # Fields are padded to their full width, so strip them to sort
+        # "abc" before "abcd". Records without the field sort first.
+        return (record.get(key) or "").strip()
+
+    return get_key
+
+
+def _write_records(records: Iterable[TenQRecordView], fp: TextIO):
+    # Lines are separated by "\r\n", with no line break after the last line,
+    # the same as the files from the writers
+    separator = ""
+    for record in records:
+        for line in record.raw_lines:
+            fp.write(separator)
+            fp.write(line)
+            separator = "\r\n"
+
+
+def _read_records(filename: str, encoding: str) -> Iterator[TenQRecordView]:
+    # Lines which cannot be placed in a record would be lost in the output
+    return iter_10q_records(filename, strict=True, encoding=encoding)
+
+
+def merge_10q_files(
+    filenames: List[str],
+    output_filename: str,
+    key: str = "debitor_nummer",
+    encoding: str = PRISME_ENCODING,
+):
+    """Merge 10Q files that are already sorted by `key` into one sorted file.
+    The files are read and written in `encoding`.
+    """
+    get_key = _sort_key(key)
+    iterators: List[Iterator[TenQRecordView]] = [
+        _read_records(filename, encoding) for filename in filenames
+    ]
+    with open(output_filename, "w", encoding=encoding, newline="") as fp:
+        _write_records(heapq.merge(*iterators, key=get_key), fp)
+
+
+def sort_10q_files(
+    filenames: List[str],
+    output_filename: str,
+    key: str = "debitor_nummer",
+    max_records_in_memory: int = 100_000,
+    max_files_per_merge: int = 64,
+    tmpdir: str = None,
+    encoding: str = PRISME_ENCODING,
+):
+    """Sort the records of one or more 10Q files by the value of field `key`
+    (e.g. "debitor_nummer" or "afstem_noegle") and write them to a new file.
+    At most `max_records_in_memory` records are held in memory at a time, and
+    at most `max_files_per_merge` files are open at a time while merging.
+    All files, including the temporary ones, are read and written in
+    `encoding`, so the lines are copied unchanged.
+    """
+    if max_records_in_memory < 1 or max_files_per_merge < 2:
+        raise ValueError("Invalid limits for sorting")
+
+    get_key = _sort_key(key)
+    with tempfile.TemporaryDirectory(dir=tmpdir) as run_dir:
+        run_filenames: List[str] = []
+        run: List[TenQRecordView] = []
+
+        def spill():
+            run.sort(key=get_key)
+            run_filename = os.path.join(run_dir, f"run{len(run_filenames)}.10q")
+            with open(run_filename, "w", encoding=encoding, newline="") as fp:
+                _write_records(run, fp)
+            run_filenames.append(run_filename)
+            run.clear()
+
+        for filename in filenames:
+            for record in _read_records(filename, encoding):
+                run.append(record)
+                if len(run) >= max_records_in_memory:
+                    spill()
+
+        if not run_filenames:
+            # Everything fits in memory
+            run.sort(key=get_key)
+            with open(output_filename, "w", encoding=encoding, newline="") as fp:
+                _write_records(run, fp)
+            return
+        if run:
+            spill()
+
+        # Merge the runs, in several passes if there are too many to open at once
+        merge_no = 0
+        while len(run_filenames) > max_files_per_merge:
+            merged_filenames = []
+            for i in range(0, len(run_filenames), max_files_per_merge):
+                merged_filename = os.path.join(run_dir, f"merge{merge_no}.10q")
+                merge_no += 1
+                merge_10q_files(
+                    run_filenames[i : i + max_files_per_merge],
+                    merged_filename,
+                    key,
+                    encoding,
+                )
+                merged_filenames.append(merged_filename)
+            for run_filename in run_filenames:
+                os.remove(run_filename)
+            run_filenames = merged_filenames
+        merge_10q_files(run_filenames, output_filename, key, encoding)
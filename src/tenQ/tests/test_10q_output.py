@@ -2,10 +2,15 @@
 #
 # SPDX-License-Identifier: MPL-2.0
 
+import io
 import unittest
+from collections.abc import Iterator
 from datetime import date, datetime, timedelta, timezone
 
+from tenQ.dates import BusinessDayCalendar, greenlandic_holidays
 from tenQ.writer import TenQTransactionWriter
+from tenQ.writer.encoding import PRISME_ENCODING
+from tenQ.writer.tenq import TenQRow
 
 
 class OutputTest(unittest.TestCase):
@@ -111,3 +116,206 @@ class OutputTest(unittest.TestCase):
                             key: value,
                         }
                     )
+
+    def test_compiled_output_matches_transactions(self):
+        writer = self.ean_transaction_writer
+        data = {
+            "cpr_nummer": "123456789",
+            "rate_beloeb": "0000012345-",
+            "afstem_noegle": "{braces}",
+            "sag_nummer": "07",
+            "individ_type": "21",
+            "rate_nummer": "001",
+            "belob_type": 2,
+            "rentefri_beloeb": "0000000100+",
+            "opkraev_kode": 3,
+            "ean_lokationsnummer": "1234",
+            "line_number": "001",
+            "rate_text": "x" * 70,
+        }
+        for trans_type, transaction in writer.transaction_map.items():
+            with self.subTest(trans_type):
+                self.assertEqual(
+                    writer.line_serializers[trans_type].serialize(
+                        {
+                            **data,
+                            "debitor_nummer": "0123456789",
+                            "person_nummer": "0123456789",
+                        }
+                    ),
+                    transaction.serialize_transaction(**data),
+                )
+
+    def test_writer_calendar(self):
+        kwargs = {
+            "leverandoer_ident": "10Q",
+            "due_date": date(2025, 4, 1),
+            "year": 2025,
+        }
+        # The 20th is Easter Sunday, and the day after is also a holiday
+        self.assertEqual(
+            TenQTransactionWriter(**kwargs).transaction_24["betal_dato"], "20250421"
+        )
+        calendar = BusinessDayCalendar(
+            date(2025, 1, 1), date(2025, 12, 31), greenlandic_holidays
+        )
+        writer = TenQTransactionWriter(**kwargs, calendar=calendar)
+        self.assertEqual(writer.transaction_24["betal_dato"], "20250422")
+        self.assertEqual(writer.transaction_24["opkraev_dato"], "20250422")
+
+    def test_writer_invalid_init_data(self):
+        writer = TenQTransactionWriter(
+            leverandoer_ident="10Q10Q",
+            due_date=date(2022, 2, 18),
+            year=2022,
+        )
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                writer.serialize_transaction(
+                    cpr_nummer="1234567890",
+                    amount_in_dkk=1000,
+                    afstem_noegle="e688d6a6fc65424483819520bbbe7745",
+                    rate_text="hephey",
+                )
+
+    def test_writer_non_default_args(self):
+        writer = self.transaction_writers[0]
+        kwargs = {
+            "cpr_nummer": "1234567890",
+            "amount_in_dkk": 1000,
+            "afstem_noegle": "e688d6a6fc65424483819520bbbe7745",
+            "rate_text": "",
+        }
+        default = writer.serialize_transaction(**kwargs)
+        self.assertEqual(
+            writer.serialize_transaction(**kwargs, sag_nummer=0, rentefri_beloeb=0),
+            default,
+        )
+        line_24 = writer.serialize_transaction(
+            **kwargs, sag_nummer=7, rate_nummer=1, rentefri_beloeb=5
+        ).split("\r\n")[1]
+        self.assertEqual(
+            line_24,
+            default.split("\r\n")[1].replace(
+                "123456789000209990000100000+10000000000+",
+                "123456789007200010000100000+10000000005+",
+            ),
+        )
+        # Not an int, so not the default
+        with self.assertRaises(ValueError):
+            writer.serialize_transaction(**kwargs, belob_type=True)
+
+    def test_serialize_transactions(self):
+        writer = self.transaction_writers[0]
+        rows = [
+            {
+                "cpr_nummer": "1234567890",
+                "amount_in_dkk": 1000,
+                "afstem_noegle": "e688d6a6fc65424483819520bbbe7745",
+                "rate_text": "Testing\r\nwith\r\nlines",
+            },
+            ("2345678901", -5, "abc", "Text for år", 0, 20, 999, 1, 0, 1, "123"),
+        ]
+        expected = "\r\n".join(
+            [
+                writer.serialize_transaction(**rows[0]),
+                writer.serialize_transaction(*rows[1]),
+            ]
+        )
+        lines = writer.serialize_transactions(iter(rows))
+        self.assertIsInstance(lines, Iterator)
+        self.assertEqual("\r\n".join(lines), expected)
+
+        text = io.StringIO()
+        self.assertEqual(writer.write_transactions(rows, text, buffer_size=10), 9)
+        self.assertEqual(text.getvalue(), expected)
+
+        binary = io.BytesIO()
+        writer.write_transactions(rows, binary)
+        self.assertEqual(binary.getvalue(), expected.encode(PRISME_ENCODING))
+
+        empty = io.StringIO()
+        self.assertEqual(writer.write_transactions([], empty), 0)
+        self.assertEqual(empty.getvalue(), "")
+
+    def test_serialize_rows(self):
+        writer = self.transaction_writers[0]
+        row = TenQRow("1234567890", 1000, "abc", "Testing\r\nwith\r\nlines")
+        self.assertEqual(
+            list(writer.serialize_transactions([row])),
+            writer.serialize_transaction_lines(
+                cpr_nummer="1234567890",
+                amount_in_dkk=1000,
+                afstem_noegle="abc",
+                rate_text="Testing\r\nwith\r\nlines",
+            ),
+        )
+        row = row._replace(ean_lokationsnummer="123", sag_nummer=5)
+        self.assertEqual(
+            list(writer.serialize_transactions([row])),
+            writer.serialize_transaction_lines(*row),
+        )
+
+    def test_rate_text_lines_are_cached(self):
+        writer = self.transaction_writers[0]
+        rate_text = "Testing\r\nwith\r\nlines"
+        first = writer.serialize_transaction("1234567890", 1, "abc", rate_text)
+        second = writer.serialize_transaction("2345678901", 2, "def", rate_text)
+        self.assertEqual(writer._rate_text_lines.cache_info().hits, 1)
+
+        # An int subclass takes the path which renders every line
+        class Int(int):
+            pass
+
+        self.assertEqual(
+            [first, second],
+            [
+                writer.serialize_transaction(*args, rate_text, sag_nummer=Int(0))
+                for args in (("1234567890", 1, "abc"), ("2345678901", 2, "def"))
+            ],
+        )
+
+    def test_serialize_columns(self):
+        writer = self.ean_transaction_writer
+        columns = {
+            "cpr_nummer": ["1234567890", 2345678, "0000000001"],
+            "amount_in_dkk": [1000, -5, 0],
+            "afstem_noegle": ["e688d6a6fc65424483819520bbbe7745", "abc", "{}"],
+            "rate_text": ["Testing\r\nwith\r\nlines", "", "Text"],
+            "ean_lokationsnummer": ["", "9876543219876", ""],
+        }
+        self.assertEqual(
+            writer.serialize_columns(**columns),
+            [
+                writer.serialize_transaction(**dict(zip(columns, row)))
+                for row in zip(*columns.values())
+            ],
+        )
+        self.assertEqual(
+            writer.serialize_columns(*list(columns.values())[:4]),
+            writer.serialize_columns(
+                **{**columns, "ean_lokationsnummer": ["", "", ""]}
+            ),
+        )
+
+    def test_serialize_columns_invalid_input(self):
+        writer = self.transaction_writers[0]
+        columns = {
+            "cpr_nummer": ["1234567890", "2345678901"],
+            "amount_in_dkk": [1000, 1000],
+            "afstem_noegle": ["a", "b"],
+            "rate_text": ["", ""],
+        }
+        for key, value in (
+            ("cpr_nummer", "12345678901"),
+            ("amount_in_dkk", 1000000000),
+            ("afstem_noegle", "e688d6a6fc65424483819520bbbe7745xxxx"),
+            ("afstem_noegle", None),
+        ):
+            with self.subTest(key):
+                with self.assertRaises(ValueError):
+                    writer.serialize_columns(
+                        **{**columns, key: [columns[key][0], value]}
+                    )
+        with self.assertRaises(ValueError):
+            writer.serialize_columns(**{**columns, "rate_text": [""]})
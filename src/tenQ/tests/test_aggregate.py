@@ -0,0 +1,193 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from tenQ.aggregate import (
+    Aggregate,
+    aggregate_10q_file,
+    aggregate_g68_file,
+    aggregate_g69_file,
+)
+from tenQ.writer import G69TransactionWriter, TenQTransactionWriter
+from tenQ.writer.encoding import PrismeBuffer
+from tenQ.writer.g68 import (
+    G68TransactionWriter,
+    TransaktionstypeEnum,
+    UdbetalingsberettigetIdentKodeEnum,
+)
+
+
+class AggregateTest(unittest.TestCase):
+    def _write_file(self, lines):
+        fd, filename = tempfile.mkstemp()
+        with os.fdopen(fd, "w", newline="") as fp:
+            fp.write("\r\n".join(lines))
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def _binary_file(self):
+        fd, filename = tempfile.mkstemp()
+        self.addCleanup(os.remove, filename)
+        return os.fdopen(fd, "wb"), filename
+
+    def test_10q(self):
+        rows = [("1111111111", 100), ("2222222222", -50), ("1111111111", 25)]
+        writers = [
+            TenQTransactionWriter(
+                due_date=date(2022, 2, 18),
+                year=year,
+                leverandoer_ident="10Q",
+                timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+            )
+            for year in (2022, 2023)
+        ]
+        filenames = [
+            self._write_file(
+                writer.serialize_transaction(
+                    cpr_nummer=cpr,
+                    amount_in_dkk=amount,
+                    afstem_noegle="x",
+                    rate_text="a",
+                )
+                for cpr, amount in rows
+            )
+            for writer in writers
+        ]
+        aggregate = aggregate_10q_file(filenames[0])
+        self.assertEqual(aggregate.by, ("debitor_nummer",))
+        self.assertEqual(aggregate.amount(("1111111111",)), 12500)
+        self.assertEqual(aggregate.count(("1111111111",)), 2)
+        self.assertEqual(aggregate.amount(("2222222222",)), -5000)
+
+        by = ("debitor_nummer", "paalign_aar")
+        partials = [aggregate_10q_file(filename, by=by) for filename in filenames]
+        combined = Aggregate.combine(partials)
+        self.assertEqual(len(combined), 4)
+        self.assertEqual(combined.amount(("1111111111", "2023")), 12500)
+        self.assertEqual(combined, partials[0] + partials[1])
+        # Adding to an existing aggregate gives the same result
+        self.assertEqual(
+            aggregate_10q_file(filenames[1], by=by, aggregate=partials[0]), combined
+        )
+        # Aggregates can be passed between processes
+        self.assertEqual(pickle.loads(pickle.dumps(combined)), combined)
+
+    def test_10q_invalid_field(self):
+        filename = self._write_file([])
+        with self.assertRaises(ValueError):
+            aggregate_10q_file(filename, by=("person_nummer",))
+
+    def test_combine_different_keys(self):
+        with self.assertRaises(ValueError):
+            Aggregate(("a",)) + Aggregate(("b",))
+        with self.assertRaises(ValueError):
+            Aggregate.combine([])
+
+    def test_g68(self):
+        writer = G68TransactionWriter(0, 0)
+        filename = self._write_file(
+            writer.serialize_transaction(
+                TransaktionstypeEnum.AndenDestinationTilladt,
+                UdbetalingsberettigetIdentKodeEnum.CPR,
+                recipient,
+                amount,
+                date(2020, 1, 27),
+                date(2020, 2, 1),
+                "1",
+                "Text",
+            )
+            for recipient, amount in (
+                ("0101012222", 1234),
+                ("0202023333", 10),
+                ("0101012222", 66),
+            )
+        )
+        aggregate = aggregate_g68_file(filename)
+        self.assertEqual(aggregate.amount(("00000101012222",)), 130000)
+        self.assertEqual(aggregate.count(("00000101012222",)), 2)
+        aggregate = aggregate_g68_file(
+            filename, by=("Registreringssted", "UdbetalingsberettigetIdentKode")
+        )
+        self.assertEqual(aggregate.amount(("000", "02")), 131000)
+        with self.assertRaises(ValueError):
+            aggregate_g68_file(filename, by=("Foo",))
+
+    def test_g69(self):
+        writer = G69TransactionWriter(12, 34)
+        filename = self._write_file(
+            writer.serialize_transaction_pair(
+                maskinnr=123,
+                eks_løbenr=1,
+                post_dato=date(2022, 3, 11),
+                kontonr=kontonr,
+                beløb=amount,
+            )
+            for kontonr, amount in (
+                (1234, Decimal("123.45")),
+                (5678, Decimal("-10")),
+                (1234, Decimal("1")),
+            )
+        )
+        aggregate = aggregate_g69_file(filename, by=("kontonr", "deb_kred"))
+        self.assertEqual(aggregate.amount(("000000000001234", "D")), 12445)
+        self.assertEqual(aggregate.count(("000000000001234", "K")), 2)
+        self.assertEqual(aggregate.amount(("000000000005678", "K")), -1000)
+        with self.assertRaises(ValueError):
+            aggregate_g69_file(filename, by=("foo",))
+
+    def test_prisme_encoded_files(self):
+        # Files written in binary by the writers, with non-ASCII texts
+        fp, filename = self._binary_file()
+        with fp:
+            TenQTransactionWriter(
+                due_date=date(2022, 2, 18), year=2022, leverandoer_ident="10Q"
+            ).write_transactions(
+                [("1111111111", 100, "x", "Skat for året"), ("1111111111", 1, "y", "")],
+                fp,
+            )
+        self.assertEqual(aggregate_10q_file(filename).amount(("1111111111",)), 10100)
+
+        fp, filename = self._binary_file()
+        with fp:
+            G68TransactionWriter(0, 0).write_transactions(
+                [
+                    (
+                        TransaktionstypeEnum.AndenDestinationTilladt,
+                        UdbetalingsberettigetIdentKodeEnum.CPR,
+                        "0101012222",
+                        amount,
+                        date(2020, 1, 27),
+                        date(2020, 2, 1),
+                        "1",
+                        "Betaling for måned",
+                    )
+                    for amount in (12, 34)
+                ],
+                fp,
+            )
+        self.assertEqual(aggregate_g68_file(filename).amount(("00000101012222",)), 4600)
+
+        writer = G69TransactionWriter(12, 34)
+        buffer = PrismeBuffer()
+        for amount in (Decimal("1.5"), Decimal(2)):
+            writer.serialize_transaction_bytes(
+                buffer,
+                maskinnr=123,
+                eks_løbenr=1,
+                post_dato=date(2022, 3, 11),
+                kontonr=1234,
+                beløb=amount,
+                deb_kred="D",
+                posteringstekst="Akileraarut ukiumut ålægning",
+            )
+        fp, filename = self._binary_file()
+        with fp:
+            buffer.write_to(fp)
+        self.assertEqual(aggregate_g69_file(filename).amount(("000000000001234",)), 350)
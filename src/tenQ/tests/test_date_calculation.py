@@ -3,12 +3,19 @@
 # SPDX-License-Identifier: MPL-2.0
 
 import unittest
-from datetime import date
+from datetime import date, datetime, timedelta
 
 from tenQ.dates import (
+    BusinessDayCalendar,
+    danish_holidays,
+    easter_sunday,
     get_due_date,
+    get_due_dates,
     get_last_payment_date,
     get_last_payment_date_from_due_date,
+    get_last_payment_dates,
+    get_last_payment_dates_from_due_dates,
+    greenlandic_holidays,
 )
 
 
@@ -65,3 +72,120 @@ class Test10QDateCalculation(unittest.TestCase):
                 "Ref date %s: Last payment date is the same when calculated "
                 "from ref date and due date" % ref_date.isoformat(),
             )
+
+
+class Test10QBatchDateCalculation(unittest.TestCase):
+    def setUp(self):
+        start = date(2019, 11, 1)
+        self.dates = [start + timedelta(days=i) for i in range(3 * 366)]
+
+    def test_due_dates(self):
+        self.assertEqual(
+            get_due_dates(self.dates), [get_due_date(d) for d in self.dates]
+        )
+
+    def test_last_payment_dates(self):
+        self.assertEqual(
+            get_last_payment_dates(self.dates),
+            [get_last_payment_date(d) for d in self.dates],
+        )
+
+    def test_last_payment_dates_from_due_dates(self):
+        due_dates = get_due_dates(self.dates)
+        self.assertEqual(
+            get_last_payment_dates_from_due_dates(due_dates),
+            [get_last_payment_date_from_due_date(d) for d in due_dates],
+        )
+
+    def test_datetimes(self):
+        values = [datetime(2020, 2, 1, 12, 30), datetime(2020, 11, 1)]
+        self.assertEqual(get_due_dates(values), [date(2020, 6, 1), date(2021, 3, 1)])
+        self.assertEqual(
+            get_last_payment_dates_from_due_dates(values),
+            [datetime(2020, 2, 20, 12, 30), datetime(2020, 11, 20)],
+        )
+
+    def test_empty(self):
+        self.assertEqual(get_due_dates(()), [])
+        self.assertEqual(get_last_payment_dates(iter([])), [])
+
+    def test_out_of_range(self):
+        # Same error as the scalar version
+        with self.assertRaises(ValueError):
+            get_due_dates([date(9999, 10, 1)])
+
+
+class BusinessDayCalendarTest(unittest.TestCase):
+    def test_easter_sunday(self):
+        self.assertEqual(
+            [easter_sunday(year) for year in (2000, 2019, 2024, 2025, 2038)],
+            [
+                date(2000, 4, 23),
+                date(2019, 4, 21),
+                date(2024, 3, 31),
+                date(2025, 4, 20),
+                date(2038, 4, 25),
+            ],
+        )
+
+    def test_holidays(self):
+        self.assertIn(date(2023, 5, 5), danish_holidays(2023))  # Store bededag
+        self.assertNotIn(date(2024, 4, 26), danish_holidays(2024))
+        self.assertIn(date(2024, 4, 26), greenlandic_holidays(2024))
+        self.assertIn(date(2024, 6, 21), greenlandic_holidays(2024))
+
+    def test_weekends_only(self):
+        # Without holidays, the results are the same as the plain functions
+        calendar = BusinessDayCalendar(date(2019, 1, 1), date(2023, 12, 31))
+        day = date(2019, 1, 1)
+        while day < date(2023, 9, 1):
+            self.assertEqual(
+                get_last_payment_date(day, calendar), get_last_payment_date(day)
+            )
+            day += timedelta(days=1)
+
+    def test_holiday_lookup(self):
+        calendar = BusinessDayCalendar(
+            date(2025, 1, 1), date(2025, 12, 31), greenlandic_holidays
+        )
+        self.assertTrue(calendar.is_business_day(date(2025, 4, 16)))
+        self.assertFalse(calendar.is_business_day(date(2025, 4, 17)))
+        # Skærtorsdag to 2. påskedag
+        self.assertEqual(
+            calendar.next_business_day(date(2025, 4, 17)), date(2025, 4, 22)
+        )
+        # Nytårsaftensdag rolls over into the next year
+        self.assertEqual(
+            calendar.next_business_day(date(2025, 12, 31)), date(2026, 1, 2)
+        )
+        self.assertEqual(
+            calendar.last_payment_date(date(2025, 4, 1)), date(2025, 4, 22)
+        )
+        self.assertEqual(
+            get_last_payment_dates([date(2024, 12, 5), date(2025, 1, 6)], calendar),
+            [date(2025, 4, 22), date(2025, 5, 20)],
+        )
+        self.assertEqual(
+            get_last_payment_date_from_due_date(datetime(2025, 4, 1, 8, 0), calendar),
+            datetime(2025, 4, 22, 8, 0),
+        )
+
+    def test_holiday_collection(self):
+        calendar = BusinessDayCalendar(
+            date(2025, 6, 1), date(2025, 6, 30), holidays=[date(2025, 6, 20)]
+        )
+        self.assertEqual(
+            calendar.next_business_day(date(2025, 6, 20)), date(2025, 6, 23)
+        )
+
+    def test_outside_range(self):
+        calendar = BusinessDayCalendar(date(2025, 1, 1), date(2025, 12, 31))
+        for day in (date(2024, 12, 31), date(2026, 1, 1)):
+            with self.assertRaises(ValueError):
+                calendar.next_business_day(day)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            BusinessDayCalendar(date(2025, 1, 2), date(2025, 1, 1))
+        with self.assertRaises(ValueError):
+            BusinessDayCalendar(date(2025, 1, 1), date(2025, 1, 2), weekend=range(7))
@@ -0,0 +1,38 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import unittest
+from datetime import date, datetime, timedelta
+
+from tenQ.datecodec import format_date, parse_date
+
+
+class DateCodecTest(unittest.TestCase):
+    def test_format_date(self):
+        self.assertEqual(format_date(date(2022, 3, 1)), "20220301")
+        self.assertEqual(format_date(datetime(2022, 12, 31, 23, 59)), "20221231")
+
+    def test_format_date_matches_strftime(self):
+        day = date(1999, 12, 25)
+        for _ in range(800):
+            self.assertEqual(format_date(day), day.strftime("%Y%m%d"))
+            day += timedelta(days=1)
+        for day in (date(1, 1, 1), date(999, 12, 31), date(9999, 12, 31)):
+            self.assertEqual(format_date(day), day.strftime("%Y%m%d"))
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date("20200229"), date(2020, 2, 29))
+        self.assertEqual(parse_date("00010101"), date(1, 1, 1))
+
+    def test_parse_date_invalid(self):
+        for value in ("2020022", "202002290", "2020-2-1", " 2020022", "20210229"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_date(value)
+
+    def test_round_trip(self):
+        day = date(2023, 1, 1)
+        for _ in range(400):
+            self.assertEqual(parse_date(format_date(day)), day)
+            day += timedelta(days=1)
@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import io
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from tenQ.writer import G69TransactionWriter, TenQTransactionWriter
+from tenQ.writer.encoding import PRISME_ENCODING, PrismeBuffer
+from tenQ.writer.g68 import (
+    G68TransactionWriter,
+    TransaktionstypeEnum,
+    UdbetalingsberettigetIdentKodeEnum,
+)
+
+
+class PrismeBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = PrismeBuffer()
+        self.tenq_writer = TenQTransactionWriter(
+            due_date=date(2022, 2, 18),
+            year=2022,
+            leverandoer_ident="10Q",
+            timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+        )
+        self.tenq_kwargs = {
+            "cpr_nummer": "1234567890",
+            "amount_in_dkk": 1000,
+            "afstem_noegle": "e688d6a6fc65424483819520bbbe7745",
+            "rate_text": "Første linje\r\nAnden linje",
+        }
+        self.g68_args = (
+            TransaktionstypeEnum.AndenDestinationTilladt,
+            UdbetalingsberettigetIdentKodeEnum.CPR,
+            "0101012222",
+            1234,
+            date(2020, 1, 27),
+            date(2020, 2, 1),
+            "012345678",
+            "Denne måneds udbetaling",
+        )
+        self.g69_kwargs = {
+            "maskinnr": 123,
+            "eks_løbenr": 1,
+            "post_dato": date(2022, 3, 11),
+            "kontonr": 1234,
+            "beløb": Decimal("12.34"),
+            "posteringstekst": "Æble",
+        }
+
+    def test_tenq(self):
+        self.tenq_writer.serialize_transaction_bytes(self.buffer, **self.tenq_kwargs)
+        self.tenq_writer.serialize_transaction_bytes(self.buffer, **self.tenq_kwargs)
+        text = self.tenq_writer.serialize_transaction(**self.tenq_kwargs)
+        self.assertEqual(
+            bytes(self.buffer.buffer),
+            "\r\n".join([text, text]).encode(PRISME_ENCODING),
+        )
+
+    def test_tenq_unencodable(self):
+        with self.assertRaisesRegex(ValueError, "afstem_noegle"):
+            self.tenq_writer.serialize_transaction_bytes(
+                self.buffer, **{**self.tenq_kwargs, "afstem_noegle": "€"}
+            )
+        with self.assertRaisesRegex(ValueError, "rate_text"):
+            self.tenq_writer.serialize_transaction_bytes(
+                self.buffer, **{**self.tenq_kwargs, "rate_text": "a\r\nb\r\n€"}
+            )
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_tenq_write_transactions_binary(self):
+        fp = io.BytesIO()
+        self.tenq_writer.write_transactions([self.tenq_kwargs] * 3, fp, buffer_size=100)
+        self.assertEqual(
+            fp.getvalue(),
+            "\r\n".join(
+                [self.tenq_writer.serialize_transaction(**self.tenq_kwargs)] * 3
+            ).encode(PRISME_ENCODING),
+        )
+        with self.assertRaisesRegex(ValueError, "afstem_noegle"):
+            self.tenq_writer.write_transactions(
+                [{**self.tenq_kwargs, "afstem_noegle": "€"}], io.BytesIO()
+            )
+
+    def test_g68(self):
+        writer = G68TransactionWriter(0, 0)
+        writer.serialize_transaction_bytes(self.buffer, *self.g68_args)
+        writer.reset_line_number()
+        self.assertEqual(
+            bytes(self.buffer.buffer),
+            writer.serialize_transaction(*self.g68_args).encode(PRISME_ENCODING),
+        )
+        args = list(self.g68_args)
+        args[6] = "€"
+        with self.assertRaisesRegex(ValueError, "Fakturanummer"):
+            writer.serialize_transaction_bytes(self.buffer, *args)
+        args[6] = "1"
+        args[7] = "a\nb€"
+        with self.assertRaisesRegex(ValueError, "BetalingstekstLinje"):
+            writer.serialize_transaction_bytes(self.buffer, *args)
+
+    def test_g69(self):
+        writer = G69TransactionWriter(12, 34)
+        writer.serialize_transaction_pair_bytes(self.buffer, **self.g69_kwargs)
+        writer.serialize_transaction_bytes(self.buffer, **self.g69_kwargs, deb_kred="D")
+        writer.reset_line_number()
+        self.assertEqual(
+            bytes(self.buffer.buffer),
+            "\r\n".join(
+                [
+                    writer.serialize_transaction_pair(**self.g69_kwargs),
+                    writer.serialize_transaction(**self.g69_kwargs, deb_kred="D"),
+                ]
+            ).encode(PRISME_ENCODING),
+        )
+        with self.assertRaisesRegex(ValueError, "posteringstekst"):
+            writer.serialize_transaction_pair_bytes(
+                self.buffer, **{**self.g69_kwargs, "posteringstekst": "€"}
+            )
+
+    def test_write_to_and_open(self):
+        self.buffer.append("abc\r\næøå", lambda line, pos: "unknown")
+        fp = io.BytesIO()
+        self.buffer.write_to(fp)
+        self.assertEqual(fp.getvalue(), "abc\r\næøå".encode(PRISME_ENCODING))
+        with self.buffer.open() as reader:
+            self.assertEqual(reader.read(2), b"ab")
+            self.assertEqual(reader.read(), "c\r\næøå".encode(PRISME_ENCODING))
+        # The buffer can be reused once the reader is closed
+        self.buffer.clear()
+        self.assertEqual(len(self.buffer), 0)
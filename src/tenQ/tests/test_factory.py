@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+from tenQ.writer import TenQTransactionWriter
+from tenQ.writer.factory import TenQWriterFactory
+
+
+class TenQWriterFactoryTest(unittest.TestCase):
+    timestamp = datetime(2022, 2, 18, 12, 35, tzinfo=timezone.utc)
+
+    def _kwargs(self, month=2, year=2022):
+        return {
+            "due_date": date(year, month, 18),
+            "year": year,
+            "leverandoer_ident": "10Q",
+            "timestamp": self.timestamp,
+        }
+
+    def test_writers_are_reused(self):
+        factory = TenQWriterFactory()
+        writer = factory.get(**self._kwargs())
+        self.assertIs(factory.get(**self._kwargs()), writer)
+        self.assertIsNot(factory.get(**self._kwargs(month=3)), writer)
+        self.assertEqual(len(factory), 2)
+
+    def test_output_matches_writer(self):
+        factory = TenQWriterFactory()
+        self.assertEqual(
+            factory.get(**self._kwargs()).serialize_transaction(
+                "1234567890", 100, "afstem", "Text"
+            ),
+            TenQTransactionWriter(**self._kwargs()).serialize_transaction(
+                "1234567890", 100, "afstem", "Text"
+            ),
+        )
+
+    def test_least_recently_used_is_evicted(self):
+        factory = TenQWriterFactory(maxsize=2)
+        first = factory.get(**self._kwargs(month=1))
+        second = factory.get(**self._kwargs(month=2))
+        self.assertIs(factory.get(**self._kwargs(month=1)), first)
+        factory.get(**self._kwargs(month=3))
+        self.assertEqual(len(factory), 2)
+        self.assertIs(factory.get(**self._kwargs(month=1)), first)
+        self.assertIsNot(factory.get(**self._kwargs(month=2)), second)
+
+    def test_clear(self):
+        factory = TenQWriterFactory()
+        factory.get(**self._kwargs())
+        factory.clear()
+        self.assertEqual(len(factory), 0)
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            TenQWriterFactory(maxsize=0)
+
+    def test_threads(self):
+        factory = TenQWriterFactory(maxsize=4)
+        with patch(
+            "tenQ.writer.factory.TenQTransactionWriter",
+            side_effect=TenQTransactionWriter,
+        ) as constructor:
+            with ThreadPoolExecutor(8) as executor:
+                writers = list(
+                    executor.map(
+                        lambda month: factory.get(**self._kwargs(month=month)),
+                        [1, 2, 3, 4] * 50,
+                    )
+                )
+        self.assertEqual(constructor.call_count, 4)
+        self.assertEqual(len({id(writer) for writer in writers}), 4)
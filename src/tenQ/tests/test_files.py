@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from tenQ.reader import read_10q_file
+from tenQ.writer import G69TransactionWriter, TenQTransactionWriter
+from tenQ.writer.files import SplitFileWriter
+
+
+class SplitFileWriterTest(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.directory = tmpdir.name
+        self.tenq_writer = TenQTransactionWriter(
+            due_date=date(2022, 2, 18),
+            year=2022,
+            leverandoer_ident="10Q",
+            timestamp=datetime(2022, 2, 18, 12, 35, tzinfo=timezone.utc),
+        )
+        self.tenq_rows = [
+            (str(i).zfill(10), i * 10, f"afstem-{i}", f"Text\r\nfor {i}")
+            for i in range(7)
+        ]
+        self.g69_rows = [
+            {
+                "maskinnr": 123,
+                "eks_løbenr": i,
+                "post_dato": date(2022, 3, 11),
+                "kontonr": 1234,
+                "beløb": Decimal(i),
+            }
+            for i in range(5)
+        ]
+
+    def _read(self, filename):
+        with open(filename, "rb") as fp:
+            return fp.read()
+
+    def test_split_by_transactions(self):
+        with SplitFileWriter(
+            self.tenq_writer, self.directory, max_transactions=3
+        ) as writer:
+            writer.write_rows(self.tenq_rows)
+        manifest = writer.manifest
+        self.assertEqual([entry["transactions"] for entry in manifest], [3, 3, 1])
+        self.assertEqual(
+            [os.path.basename(entry["filename"]) for entry in manifest],
+            ["0001.txt", "0002.txt", "0003.txt"],
+        )
+        expected = "\r\n".join(
+            self.tenq_writer.serialize_transaction(*row) for row in self.tenq_rows
+        )
+        self.assertEqual(
+            b"\r\n".join(self._read(entry["filename"]) for entry in manifest),
+            expected.encode("iso-8859-1"),
+        )
+        for entry in manifest:
+            data = self._read(entry["filename"])
+            self.assertEqual(entry["bytes"], len(data))
+            self.assertEqual(entry["sha256"], hashlib.sha256(data).hexdigest())
+        self.assertEqual(
+            [
+                record["debitor_nummer"]
+                for record in read_10q_file(manifest[1]["filename"])
+            ],
+            ["0000000003", "0000000004", "0000000005"],
+        )
+
+    def test_split_by_bytes_keeps_blocks_whole(self):
+        size = len(self.tenq_writer.serialize_transaction(*self.tenq_rows[0]))
+        writer = SplitFileWriter(
+            self.tenq_writer, self.directory, max_bytes=2 * size + 10
+        )
+        writer.write_rows(self.tenq_rows)
+        manifest = writer.close()
+        self.assertEqual([entry["transactions"] for entry in manifest], [2, 2, 2, 1])
+        for entry in manifest:
+            self.assertLessEqual(entry["bytes"], 2 * size + 10)
+            self.assertEqual(
+                len(read_10q_file(entry["filename"])), entry["transactions"]
+            )
+
+    def test_oversized_transaction_gets_own_file(self):
+        writer = SplitFileWriter(self.tenq_writer, self.directory, max_bytes=10)
+        writer.write_rows(self.tenq_rows[:2])
+        self.assertEqual([entry["transactions"] for entry in writer.close()], [1, 1])
+
+    def test_line_numbers_restart_per_file(self):
+        g69_writer = G69TransactionWriter(registreringssted=12, organisationsenhed=34)
+        completed = []
+        with SplitFileWriter(
+            g69_writer,
+            self.directory,
+            filename_pattern="g69_{index}.txt",
+            max_transactions=2,
+            method="serialize_transaction_pair",
+            on_file_complete=completed.append,
+        ) as writer:
+            writer.write_rows(self.g69_rows[:2])
+            self.assertEqual(completed, [])
+            writer.write_rows(self.g69_rows[2:4])
+            self.assertEqual(len(completed), 1)
+            writer.write_rows(self.g69_rows[4:])
+        self.assertEqual(completed, writer.manifest)
+
+        reference = G69TransactionWriter(registreringssted=12, organisationsenhed=34)
+        for index, entry in enumerate(writer.manifest):
+            self.assertEqual(
+                os.path.basename(entry["filename"]), f"g69_{index + 1}.txt"
+            )
+            reference.reset_line_number()
+            rows = self.g69_rows[index * 2 : index * 2 + 2]
+            expected = "\r\n".join(
+                reference.serialize_transaction_pair(**row) for row in rows
+            )
+            self.assertEqual(
+                self._read(entry["filename"]), expected.encode("iso-8859-1")
+            )
+
+    def test_line_numbers_restart_on_byte_rollover(self):
+        g69_writer = G69TransactionWriter(registreringssted=12, organisationsenhed=34)
+        size = len(g69_writer.serialize_transaction_pair(**self.g69_rows[0]))
+        writer = SplitFileWriter(
+            g69_writer,
+            self.directory,
+            max_bytes=size,
+            method="serialize_transaction_pair",
+        )
+        writer.write_rows(self.g69_rows[:2])
+        for entry in writer.close():
+            self.assertEqual(self._read(entry["filename"])[6:11], b"00001")
+
+    def test_write_manifest(self):
+        writer = SplitFileWriter(self.tenq_writer, self.directory, max_transactions=5)
+        writer.write_rows(self.tenq_rows)
+        writer.close()
+        filename = os.path.join(self.directory, "manifest.json")
+        writer.write_manifest(filename)
+        with open(filename) as fp:
+            self.assertEqual(json.load(fp), writer.manifest)
+
+    def test_no_transactions(self):
+        with SplitFileWriter(self.tenq_writer, self.directory) as writer:
+            pass
+        self.assertEqual(writer.manifest, [])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failed_write_discards_file(self):
+        completed = []
+        with self.assertRaises(ValueError):
+            with SplitFileWriter(
+                self.tenq_writer, self.directory, on_file_complete=completed.append
+            ) as writer:
+                writer.write(*self.tenq_rows[0])
+                writer.write("12345678901", 10, "afstem", "")
+        self.assertEqual(completed, [])
+        self.assertEqual(writer.manifest, [])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failed_first_transaction_opens_no_file(self):
+        writer = SplitFileWriter(self.tenq_writer, self.directory)
+        with self.assertRaises(ValueError):
+            writer.write("12345678901", 10, "afstem", "")
+        self.assertEqual(os.listdir(self.directory), [])
+        writer.write(*self.tenq_rows[1])
+        manifest = writer.close()
+        self.assertEqual([entry["transactions"] for entry in manifest], [1])
+
+    def test_invalid_max_transactions(self):
+        with self.assertRaises(ValueError):
+            SplitFileWriter(self.tenq_writer, self.directory, max_transactions=0)
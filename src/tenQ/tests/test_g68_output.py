@@ -2,7 +2,9 @@
 #
 # SPDX-License-Identifier: MPL-2.0
 
-from datetime import date
+import io
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
 from typing import List
 from unittest import TestCase
@@ -11,11 +13,14 @@ from tenQ.writer.g68 import (
     BetalingstekstLinje,
     DateField,
     EnumField,
+    Fakturanummer,
     Field,
     FloatingFieldMixin,
     FlydendeEllerFast,
     Fortegnsmarkering,
+    G68LineSerializer,
     G68Transaction,
+    G68TransactionView,
     G68TransactionWriter,
     Linjeløbenummer,
     Maskinnummer,
@@ -218,6 +223,30 @@ class TestFloatingFieldMixin(TestCase):
         with self.assertRaises(ValueError):
             FloatingFieldMixin.validate_required_fields([Organisationsenhed(0)])
 
+    def test_validate_required_fields_message(self):
+        fields = [
+            UdIdent(0),
+            Udbetalingsbeløb(1),
+            Fortegnsmarkering("+"),
+            UdbetalingsberettigetIdentKode(2),
+            Posteringshenvisning(
+                Posteringsdato(date(2020, 1, 1)), Maskinnummer(0), Linjeløbenummer(1)
+            ),
+        ]
+        with self.assertRaisesRegex(
+            ValueError, r"missing: \['Udbetalingsberettiget'\]"
+        ):
+            FloatingFieldMixin.validate_required_fields(fields)
+        FloatingFieldMixin.validate_required_fields(fields + [Udbetalingsberettiget(1)])
+
+    def test_in_id_order(self):
+        fields = [Organisationsenhed(0), UdIdent(0), BetalingstekstLinje("a", 40)]
+        self.assertIs(FloatingFieldMixin.in_id_order(fields), fields)
+        self.assertEqual(
+            FloatingFieldMixin.in_id_order(fields[::-1]),
+            fields,
+        )
+
     def test_parse(self):
         line = "000G68&020001&1011&40Betalingstekstlinje"
         org, ident, text_line = FloatingFieldMixin.parse(line)
@@ -306,6 +335,15 @@ class TestBetalingstekstLinje(TestCase):
             list(range(cls._min_id, cls._max_id)),
         )
 
+    def test_tuple_from_text(self):
+        cls = BetalingstekstLinje
+        instances = cls.tuple_from_text("Line 1\nLine 2")
+        self.assertIs(cls.tuple_from_text("Line 1\nLine 2"), instances)
+        self.assertEqual(
+            [(instance.id, instance.val) for instance in instances],
+            [(40, "Line 1"), (41, "Line 2")],
+        )
+
 
 class TestG8TransactionWriter(TestCase):
     maxDiff = None
@@ -338,6 +376,205 @@ class TestG8TransactionWriter(TestCase):
         )
 
 
+class TestG68BatchSerialization(TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        super().setUp()
+        self.rows = [
+            (
+                TransaktionstypeEnum.AndenDestinationTilladt,
+                UdbetalingsberettigetIdentKodeEnum.CPR if i % 2 else 2,
+                str(1000000000 + i),
+                i * 10,
+                date(2020, 1, 27),
+                date(2020, 2, i % 3 + 1),
+                f"faktura-{i}",
+                "Udbetaling\nfor januar",
+            )
+            for i in range(5)
+        ]
+        self.expected = self._serialize_each(self.rows)
+
+    def _serialize_each(self, rows, line_no=1):
+        writer = G68TransactionWriter(0, 0)
+        writer.reset_line_number(line_no)
+        return [writer.serialize_transaction(*row) for row in rows]
+
+    def test_serialize_transactions(self):
+        writer = G68TransactionWriter(0, 0)
+        names = (
+            "transaction_type",
+            "recipient_type",
+            "recipient",
+            "amount",
+            "payment_date",
+            "posting_date",
+            "invoice_no",
+            "text",
+        )
+        rows = self.rows[:2] + [dict(zip(names, row)) for row in self.rows[2:]]
+        self.assertEqual(list(writer.serialize_transactions(rows)), self.expected)
+        self.assertEqual(writer.line_no, 6)
+
+    def test_write_transactions(self):
+        writer = G68TransactionWriter(0, 0)
+        fp = io.StringIO()
+        self.assertEqual(writer.write_transactions(self.rows, fp, buffer_size=100), 5)
+        self.assertEqual(fp.getvalue(), "\r\n".join(self.expected))
+
+        writer.reset_line_number()
+        fp = io.BytesIO()
+        writer.write_transactions(self.rows, fp)
+        self.assertEqual(fp.getvalue(), "\r\n".join(self.expected).encode("iso-8859-1"))
+
+    def test_serialize_columns(self):
+        writer = G68TransactionWriter(0, 0)
+        columns = list(zip(*self.rows))
+        self.assertEqual(writer.serialize_columns(*columns), self.expected)
+        self.assertEqual(writer.line_no, 6)
+        # Line numbers continue from the writer
+        self.assertEqual(
+            writer.serialize_columns(*columns), self._serialize_each(self.rows, 6)
+        )
+        self.assertEqual(writer.serialize_columns(*([()] * 8)), [])
+
+    def test_serialize_columns_invalid_input(self):
+        writer = G68TransactionWriter(0, 0)
+        columns = list(zip(*self.rows))
+        with self.assertRaises(ValueError):
+            writer.serialize_columns(*columns[:-1], columns[-1][:-1])
+        invalid = list(columns)
+        invalid[0] = invalid[0][:-1] + (True,)
+        with self.assertRaises(ValueError):
+            writer.serialize_columns(*invalid)
+        writer.reset_line_number(99997)
+        with self.assertRaises(ValueError):
+            writer.serialize_columns(*columns)
+        # Nothing is consumed when the batch fails
+        self.assertEqual(writer.line_no, 99997)
+
+
+class TestG68LineSerializer(TestCase):
+    maxDiff = None
+
+    args = (
+        TransaktionstypeEnum.AndenDestinationTilladt,
+        UdbetalingsberettigetIdentKodeEnum.CPR,
+        "0101012222",
+        1234,
+        date(2020, 1, 27),
+        date(2020, 2, 1),
+        "012345678",
+        "Line 1\nLine 2",
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.writer = G68TransactionWriter(12, 34, maskinnummer=56)
+        self.serializer = G68LineSerializer(self.writer)
+
+    def _transaction(
+        self,
+        transaction_type,
+        recipient_type,
+        recipient,
+        amount,
+        payment_date,
+        posting_date,
+        invoice_no,
+        text,
+    ):
+        return G68Transaction(
+            self.writer,
+            Transaktionstype(transaction_type),
+            UdbetalingsberettigetIdentKode(recipient_type),
+            Udbetalingsberettiget(int(recipient)),
+            Udbetalingsbeløb(amount),
+            Udbetalingsdato(payment_date),
+            Posteringsdato(posting_date),
+            Fakturanummer(invoice_no),
+            BetalingstekstLinje.list_from_text(text),
+        ).serialized_value
+
+    def _replace(self, **kwargs):
+        names = (
+            "transaction_type",
+            "recipient_type",
+            "recipient",
+            "amount",
+            "payment_date",
+            "posting_date",
+            "invoice_no",
+            "text",
+        )
+        return tuple(kwargs.get(name, arg) for name, arg in zip(names, self.args))
+
+    def test_output_matches_transaction(self):
+        for args in (
+            self.args,
+            self._replace(transaction_type=10, recipient_type=11),
+            self._replace(
+                transaction_type=TransaktionstypeEnum.TvungenDestination,
+                recipient_type=UdbetalingsberettigetIdentKodeEnum.CVR,
+            ),
+            self._replace(recipient=12345678, amount=-50),
+            self._replace(amount=Decimal("12.34")),
+            self._replace(amount=0),
+            self._replace(payment_date=datetime(2021, 5, 6, 7, 8)),
+            self._replace(invoice_no=""),
+            self._replace(text="Æblegrød\r\nmed fløde\nog sukker"),
+        ):
+            with self.subTest(args=args):
+                self.writer.reset_line_number(42)
+                expected = self._transaction(*args)
+                self.assertEqual(self.serializer.serialize(42, *args), expected)
+                self.assertEqual(self.writer.serialize_transaction(*args), expected)
+
+    def test_invalid_input(self):
+        for args in (
+            self._replace(transaction_type=2),
+            self._replace(transaction_type=True),
+            self._replace(recipient_type=4),
+            self._replace(recipient="abc"),
+            self._replace(recipient="123456789012345"),
+            self._replace(amount=10**10),
+            self._replace(payment_date="2020-01-01"),
+            self._replace(posting_date=None),
+            self._replace(invoice_no="a&b"),
+            self._replace(invoice_no="a!b"),
+            self._replace(invoice_no="a\\b"),
+            self._replace(invoice_no="x" * 21),
+            self._replace(text="a&b"),
+            self._replace(text=""),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaises(Exception) as expected:
+                    self._transaction(*args)
+                with self.assertRaises(type(expected.exception)):
+                    self.serializer.serialize(1, *args)
+
+    def test_floating_fields_are_in_id_order(self):
+        transaction = G68Transaction(
+            self.writer,
+            Transaktionstype(1),
+            UdbetalingsberettigetIdentKode(2),
+            Udbetalingsberettiget(1),
+            Udbetalingsbeløb(1),
+            Udbetalingsdato(date(2020, 1, 1)),
+            Posteringsdato(date(2020, 1, 1)),
+            Fakturanummer(""),
+            BetalingstekstLinje.list_from_text("a\nb"),
+        )
+        ids = [f.id for f in transaction.floating_fields]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_line_number_is_checked(self):
+        self.assertEqual(self.serializer.serialize(99999, *self.args)[6:11], "99999")
+        with self.assertRaises(ValueError):
+            self.serializer.serialize(100000, *self.args)
+
+
 class TestG68Transaction(TestCase):
     maxDiff = None
 
@@ -370,3 +607,48 @@ class TestG68Transaction(TestCase):
                 BetalingstekstLinje,
             ],
         )
+
+
+class TestG68TransactionView(TestCase):
+    line = (
+        "000G6800001011&020000&0300&07000000000000000000&0800000123400&09+"
+        "&1002&1100000101012222&1220200127&16202002010000000001"
+        "&17012345678"
+        "&40Denne måneds udbetaling"
+        "&41af beskæftigelsestilskud"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.view = G68TransactionView(self.line)
+
+    def test_matches_parse(self):
+        parsed = {type(field): field for field in G68Transaction.parse(self.line)}
+        for cls in (
+            Registreringssted,
+            Linjeløbenummer,
+            Transaktionstype,
+            Udbetalingsberettiget,
+            Udbetalingsdato,
+            Posteringshenvisning,
+            Fakturanummer,
+        ):
+            with self.subTest(cls.__name__):
+                self.assertEqual(self.view[cls].val, parsed[cls].val)
+
+    def test_lookup_by_name_and_id(self):
+        self.assertEqual(self.view["Udbetalingsberettiget"].val, 101012222)
+        self.assertEqual(self.view[Udbetalingsberettiget.id].val, 101012222)
+        self.assertEqual(self.view[41].val, "af beskæftigelsestilskud")
+
+    def test_raw(self):
+        self.assertEqual(self.view.raw(Udbetalingsbeløb), "00000123400")
+        self.assertEqual(self.view.raw(Linjeløbenummer), "00001")
+
+    def test_caches_decoded_fields(self):
+        self.assertIs(self.view[Fakturanummer], self.view["Fakturanummer"])
+
+    def test_missing_field(self):
+        self.assertIsNone(self.view.get(Organisationsenhed.id + 100))
+        with self.assertRaises(KeyError):
+            self.view["NoSuchField"]
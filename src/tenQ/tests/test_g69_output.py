@@ -152,6 +152,166 @@ class OutputTest(unittest.TestCase):
             "000001111111111",
         )
 
+    def test_plan_is_cached_per_key_set(self):
+        G69TransactionWriter._plan.cache_clear()
+        kwargs = {**self.minimum_required, "is_cvr": True, "ydelse_modtager": "1"}
+        first = self.transaction_writer.serialize_transaction(**kwargs)
+        self.transaction_writer.reset_line_number()
+        self.assertEqual(self.transaction_writer.serialize_transaction(**kwargs), first)
+        info = G69TransactionWriter._plan.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        # An alias value which does not map to a field value leaves the field
+        # out, which gives a different plan
+        with self.assertRaises(ValueError):
+            self.transaction_writer.serialize_transaction(**{**kwargs, "is_cvr": None})
+
+    def test_invalid_key_set_is_rejected_every_time(self):
+        kwargs = {**self.minimum_required}
+        del kwargs["kontonr"]
+        for _ in range(2):
+            with self.assertRaisesRegex(ValueError, "Field kontonr required"):
+                self.transaction_writer.serialize_transaction(**kwargs)
+        self.assertEqual(self.transaction_writer.line_number, 1)
+
+    def test_transaction_pair(self):
+        pair = self.transaction_writer.serialize_transaction_pair(
+            **self.minimum_required
+        )
+        writer = G69TransactionWriter(12, 34)
+        self.assertEqual(
+            pair,
+            "\r\n".join(
+                [
+                    writer.serialize_transaction(
+                        **{**self.minimum_required, "deb_kred": deb_kred}
+                    )
+                    for deb_kred in ("D", "K")
+                ]
+            ),
+        )
+        self.assertEqual(self.transaction_writer.line_number, 3)
+
+    def test_transaction_pair_with_is_kredit(self):
+        debit, credit = self.transaction_writer.serialize_transaction_pair(
+            **self.minimum_required, is_kredit=True
+        ).split("\r\n")
+        self.assertEqual(debit[6:11], "00001")
+        self.assertEqual(credit[6:11], "00002")
+        self.assertIn("&113K", debit)
+        self.assertIn("&113K", credit)
+
+    def test_transaction_pair_invalid_input(self):
+        with self.assertRaises(ValueError):
+            self.transaction_writer.serialize_transaction_pair(
+                **{**self.minimum_required, "kaldenavn": "a&b"}
+            )
+        self.assertEqual(self.transaction_writer.line_number, 1)
+
+    def test_transaction_pairs(self):
+        rows = [
+            {**self.minimum_required, "eks_løbenr": i, "post_type": post_type}
+            for i, post_type in enumerate(("NOR", "PRI", "SUP"))
+        ]
+        writer = G69TransactionWriter(12, 34)
+        expected = "\r\n".join(writer.serialize_transaction_pair(**row) for row in rows)
+        lines = self.transaction_writer.serialize_transaction_pairs(iter(rows))
+        self.assertEqual("\r\n".join(lines), expected)
+        self.assertEqual(self.transaction_writer.line_number, 7)
+        # The rows are not changed
+        self.assertNotIn("is_debet", rows[0])
+
+    def _columns(self, rows):
+        return {name: [row[name] for row in rows] for name in rows[0]}
+
+    def _column_rows(self):
+        return [
+            {
+                "kaldenavn": "test",
+                "maskinnr": 123,
+                "eks_løbenr": i,
+                "post_dato": date(2022, 3, 11 + i % 2),
+                "kontonr": 1234005678 + i,
+                "beløb": Decimal(i) / 3 if i % 2 else -i,
+                "is_debet": bool(i % 2),
+                "is_cvr": bool(i % 3),
+                "ydelse_modtager": 12345678,
+            }
+            for i in range(5)
+        ]
+
+    def test_serialize_columns(self):
+        rows = self._column_rows()
+        writer = G69TransactionWriter(12, 34)
+        writer.reset_line_number(10)
+        expected = [writer.serialize_transaction("SUP", **row) for row in rows]
+        self.transaction_writer.reset_line_number(10)
+        self.assertEqual(
+            self.transaction_writer.serialize_columns(self._columns(rows), "sup"),
+            expected,
+        )
+        self.assertEqual(self.transaction_writer.line_number, 15)
+        self.assertEqual(self.transaction_writer.serialize_columns({}), [])
+
+    def test_serialize_columns_pairs(self):
+        rows = self._column_rows()
+        writer = G69TransactionWriter(12, 34)
+        expected = [writer.serialize_transaction_pair(**row) for row in rows]
+        self.assertEqual(
+            self.transaction_writer.serialize_columns(self._columns(rows), pairs=True),
+            expected,
+        )
+        self.assertEqual(self.transaction_writer.line_number, 11)
+
+    def test_serialize_columns_with_differing_fields(self):
+        # Aliases which do not map to a value, and `is_kredit` in pairs, are
+        # serialized row by row
+        rows = self._column_rows()
+        rows[2]["is_cvr"] = None
+        for row in rows:
+            # Overridden by `is_cvr` when it maps to a value
+            row["ydelse_modtager_nrkode"] = 2
+            row["is_kredit"] = True
+        for pairs in (False, True):
+            with self.subTest(pairs=pairs):
+                writer = G69TransactionWriter(12, 34)
+                serialize = (
+                    writer.serialize_transaction_pair
+                    if pairs
+                    else writer.serialize_transaction
+                )
+                expected = [serialize(**row) for row in rows]
+                self.transaction_writer.reset_line_number()
+                self.assertEqual(
+                    self.transaction_writer.serialize_columns(
+                        self._columns(rows), pairs=pairs
+                    ),
+                    expected,
+                )
+
+    def test_serialize_columns_invalid_input(self):
+        columns = self._columns(self._column_rows())
+        with self.assertRaises(ValueError):
+            self.transaction_writer.serialize_columns(
+                {**columns, "kontonr": columns["kontonr"][:-1]}
+            )
+        without_kontonr = dict(columns)
+        del without_kontonr["kontonr"]
+        with self.assertRaisesRegex(ValueError, "Field kontonr required"):
+            self.transaction_writer.serialize_columns(without_kontonr)
+        with self.assertRaisesRegex(ValueError, "may not contain &"):
+            self.transaction_writer.serialize_columns(
+                {**columns, "kaldenavn": ["a", "b", "c&", "d", "e"]}
+            )
+        with self.assertRaisesRegex(ValueError, "kaldenavn=12345678901 may not exceed"):
+            self.transaction_writer.serialize_columns(
+                {**columns, "kaldenavn": ["a", "b", 12345678901, "d", "e"]}
+            )
+        with self.assertRaisesRegex(ValueError, "must be of type"):
+            self.transaction_writer.serialize_columns(
+                {**columns, "post_dato": ["2022-03-11"] * 5}
+            )
+        self.assertEqual(self.transaction_writer.line_number, 1)
+
     def _get_floating_field_value(self, transaction: str, field: int) -> str:
         match = re.match(rf".*&{field}(?P<val>\d+)&.*", transaction)
         self.assertIsNotNone(match)
@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from tenQ.writer import G69TransactionWriter
+from tenQ.writer.g68 import (
+    G68TransactionWriter,
+    TransaktionstypeEnum,
+    UdbetalingsberettigetIdentKodeEnum,
+)
+from tenQ.writer.linenumbers import LineNumberAllocator
+
+
+class LineNumberAllocatorTest(unittest.TestCase):
+    def test_allocate(self):
+        allocator = LineNumberAllocator()
+        self.assertEqual(allocator.allocate(), 1)
+        self.assertEqual(allocator.allocate(10), 2)
+        self.assertEqual(allocator.next, 12)
+        allocator.reset(5)
+        self.assertEqual(allocator.allocate(), 5)
+
+    def test_release(self):
+        allocator = LineNumberAllocator()
+        first = allocator.allocate(2)
+        self.assertTrue(allocator.release(first, 2))
+        self.assertEqual(allocator.next, 1)
+        first = allocator.allocate()
+        allocator.allocate()
+        # Releasing would leave a gap
+        self.assertFalse(allocator.release(first))
+        self.assertEqual(allocator.next, 3)
+
+    def test_reserve(self):
+        allocator = LineNumberAllocator()
+        block = allocator.reserve(3)
+        self.assertEqual(allocator.allocate(), 4)
+        self.assertEqual([block.allocate(), block.allocate(2)], [1, 2])
+        with self.assertRaises(ValueError):
+            block.allocate()
+
+    def test_threads(self):
+        allocator = LineNumberAllocator()
+        with ThreadPoolExecutor(8) as executor:
+            starts = list(executor.map(lambda _: allocator.allocate(3), range(1000)))
+        self.assertEqual(sorted(starts), list(range(1, 3001, 3)))
+
+
+class SharedWriterTest(unittest.TestCase):
+    g68_args = (
+        TransaktionstypeEnum.AndenDestinationTilladt,
+        UdbetalingsberettigetIdentKodeEnum.CPR,
+        "0101012222",
+        1234,
+        date(2020, 1, 27),
+        date(2020, 2, 1),
+        "012345678",
+        "Text",
+    )
+    g69_kwargs = {
+        "maskinnr": 123,
+        "eks_løbenr": 1,
+        "post_dato": date(2022, 3, 11),
+        "kontonr": 1234,
+        "beløb": Decimal(1),
+    }
+
+    def _line_numbers(self, lines):
+        return sorted(int(line[6:11]) for line in lines)
+
+    def test_g68_writer_shared_between_threads(self):
+        writer = G68TransactionWriter(0, 0)
+        with ThreadPoolExecutor(8) as executor:
+            lines = list(
+                executor.map(
+                    lambda _: writer.serialize_transaction(*self.g68_args), range(500)
+                )
+            )
+        self.assertEqual(self._line_numbers(lines), list(range(1, 501)))
+        self.assertEqual(writer.line_no, 501)
+
+    def test_g69_writer_shared_between_threads(self):
+        writer = G69TransactionWriter(12, 34)
+        with ThreadPoolExecutor(8) as executor:
+            pairs = list(
+                executor.map(
+                    lambda _: writer.serialize_transaction_pair(**self.g69_kwargs),
+                    range(500),
+                )
+            )
+        for pair in pairs:
+            debit, credit = pair.split("\r\n")
+            self.assertEqual(int(credit[6:11]), int(debit[6:11]) + 1)
+        lines = [line for pair in pairs for line in pair.split("\r\n")]
+        self.assertEqual(self._line_numbers(lines), list(range(1, 1001)))
+
+    def test_writers_with_reserved_blocks(self):
+        allocator = LineNumberAllocator()
+
+        def work(size):
+            writer = G69TransactionWriter(12, 34, line_numbers=allocator.reserve(size))
+            return [
+                writer.serialize_transaction(**self.g69_kwargs, deb_kred="D")
+                for _ in range(size)
+            ]
+
+        with ThreadPoolExecutor(4) as executor:
+            batches = list(executor.map(work, [10, 20, 30, 40] * 5))
+        lines = [line for batch in batches for line in batch]
+        self.assertEqual(self._line_numbers(lines), list(range(1, 501)))
+
+    def test_failed_g68_transaction_while_other_thread_allocates(self):
+        writer = G68TransactionWriter(0, 0)
+        lines = []
+
+        def serialize():
+            lines.append(writer.serialize_transaction(*self.g68_args))
+
+        class InvoiceNo(str):
+            # Another thread writes a transaction while this one is validated
+            def __iter__(self):
+                thread = threading.Thread(target=serialize)
+                thread.start()
+                thread.join()
+                return iter("&")
+
+        with self.assertRaises(ValueError):
+            writer.serialize_transaction(*self.g68_args[:6], InvoiceNo(), "Text")
+        with self.assertRaises(ValueError):
+            writer.serialize_columns(
+                *([value] for value in self.g68_args[:6]), [InvoiceNo()], ["Text"]
+            )
+        serialize()
+        self.assertEqual(self._line_numbers(lines), [1, 2, 3])
+        self.assertEqual(writer.line_no, 4)
+
+    def test_failed_transaction_does_not_use_a_line_number(self):
+        g68_writer = G68TransactionWriter(0, 0)
+        with self.assertRaises(ValueError):
+            g68_writer.serialize_transaction(*self.g68_args[:-1], "a&b")
+        self.assertEqual(g68_writer.line_no, 1)
+
+        g69_writer = G69TransactionWriter(12, 34)
+        with self.assertRaises(ValueError):
+            g69_writer.serialize_transaction(**self.g69_kwargs)
+        self.assertEqual(g69_writer.line_number, 1)
+        g69_writer.line_number = 7
+        self.assertEqual(g69_writer.line_numbers.allocate(), 7)
@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import io
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from tenQ.writer import G69TransactionWriter, TenQTransactionWriter
+from tenQ.writer.g68 import (
+    G68TransactionWriter,
+    TransaktionstypeEnum,
+    UdbetalingsberettigetIdentKodeEnum,
+)
+from tenQ.writer.linenumbers import LineNumberAllocator
+from tenQ.writer.parallel import serialize_parallel, write_parallel
+
+
+class ParallelTest(unittest.TestCase):
+    maxDiff = None
+
+    def _serial(self, writer, rows, method="serialize_transaction"):
+        serialize = getattr(writer, method)
+        return "\r\n".join(
+            serialize(**row) if isinstance(row, dict) else serialize(*row)
+            for row in rows
+        )
+
+    def _assert_same_output(self, writer_class, writer_kwargs, rows, **kwargs):
+        serial = self._serial(writer_class(**writer_kwargs), rows, **kwargs)
+        shards = list(
+            serialize_parallel(
+                writer_class, writer_kwargs, rows, processes=2, shard_size=3, **kwargs
+            )
+        )
+        self.assertEqual(len(shards), 4)
+        self.assertEqual("\r\n".join(shards), serial)
+        return serial
+
+    def test_10q(self):
+        rows = [
+            (str(i).zfill(10), i * 10, f"afstem-{i}", f"Text\r\nfor {i}")
+            for i in range(10)
+        ]
+        self._assert_same_output(
+            TenQTransactionWriter,
+            {
+                "due_date": date(2022, 2, 18),
+                "year": 2022,
+                "leverandoer_ident": "10Q",
+                "timestamp": datetime(2022, 2, 18, 12, 35, tzinfo=timezone.utc),
+            },
+            rows,
+        )
+
+    def test_10q_timestamp_is_shared(self):
+        rows = [(str(i).zfill(10), i, "afstem", "") for i in range(10)]
+        output = "\r\n".join(
+            serialize_parallel(
+                TenQTransactionWriter,
+                {
+                    "due_date": date(2022, 2, 18),
+                    "year": 2022,
+                    "leverandoer_ident": "10Q",
+                },
+                rows,
+                processes=2,
+                shard_size=3,
+            )
+        )
+        self.assertEqual(len({line[6:19] for line in output.split("\r\n")}), 1)
+
+    def test_g68(self):
+        rows = [
+            (
+                TransaktionstypeEnum.AndenDestinationTilladt,
+                UdbetalingsberettigetIdentKodeEnum.CPR,
+                str(i).zfill(10),
+                i,
+                date(2020, 1, 27),
+                date(2020, 2, 1),
+                str(i),
+                "Text",
+            )
+            for i in range(10)
+        ]
+        output = self._assert_same_output(
+            G68TransactionWriter,
+            {"registreringssted": 0, "organisationsenhed": 0},
+            rows,
+        )
+        self.assertEqual(output.split("\r\n")[-1][6:11], "00010")
+
+    def test_g69(self):
+        rows = [
+            {
+                "maskinnr": 123,
+                "eks_løbenr": i,
+                "post_dato": date(2022, 3, 11),
+                "kontonr": 1234,
+                "beløb": Decimal(i),
+            }
+            for i in range(10)
+        ]
+        output = self._assert_same_output(
+            G69TransactionWriter,
+            {"registreringssted": 12, "organisationsenhed": 34},
+            rows,
+            method="serialize_transaction_pair",
+        )
+        self.assertEqual(output.split("\r\n")[-1][6:11], "00020")
+
+    def test_unsupported_line_numbering(self):
+        kwargs = {"registreringssted": 12, "organisationsenhed": 34}
+        with self.assertRaises(ValueError):
+            list(
+                serialize_parallel(
+                    G69TransactionWriter, kwargs, [], method="serialize_transactions"
+                )
+            )
+        with self.assertRaises(ValueError):
+            list(
+                serialize_parallel(
+                    G69TransactionWriter,
+                    {**kwargs, "line_numbers": LineNumberAllocator()},
+                    [],
+                )
+            )
+
+    def test_write_parallel(self):
+        rows = [
+            {
+                "maskinnr": 1,
+                "eks_løbenr": 1,
+                "post_dato": date(2022, 3, 11),
+                "kontonr": 1,
+                "beløb": Decimal(1),
+                "deb_kred": "D",
+            }
+        ] * 5
+        kwargs = {"registreringssted": 12, "organisationsenhed": 34}
+        fp = io.StringIO()
+        self.assertEqual(
+            write_parallel(
+                G69TransactionWriter,
+                kwargs,
+                rows,
+                fp,
+                processes=2,
+                shard_size=2,
+                first_line_number=5,
+            ),
+            3,
+        )
+        writer = G69TransactionWriter(**kwargs)
+        writer.reset_line_number(5)
+        self.assertEqual(fp.getvalue(), self._serial(writer, rows))
@@ -0,0 +1,257 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from tenQ.reader import (
+    AmountRange,
+    FieldIn,
+    FieldPrefix,
+    TenQFileTail,
+    TenQLineView,
+    iter_10q_records,
+    read_10q_file,
+)
+from tenQ.writer import TenQTransactionWriter
+
+
+class ReaderTestBase(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.writer = TenQTransactionWriter(
+            leverandoer_ident="10Q",
+            creation_date=date(2022, 2, 10),
+            due_date=date(2022, 2, 18),
+            year=2022,
+            timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+        )
+        self.filename = self._write_file(
+            [
+                self.writer.serialize_transaction(
+                    cpr_nummer=cpr_nummer,
+                    amount_in_dkk=amount,
+                    afstem_noegle=f"afstem-{cpr_nummer}",
+                    rate_text="Testing\r\nwith\r\nlines",
+                )
+                for cpr_nummer, amount in (
+                    ("1111111111", 100),
+                    ("2222222222", -200),
+                    ("3333333333", 300),
+                )
+            ]
+        )
+
+    def _write_file(self, transactions):
+        fd, filename = tempfile.mkstemp(suffix=".10q")
+        with os.fdopen(fd, "w", newline="") as fp:
+            fp.write("\r\n".join(transactions))
+        self.addCleanup(os.remove, filename)
+        return filename
+
+
+class ReaderTest(ReaderTestBase):
+
+    def test_line_view(self):
+        line = self.writer.serialize_transaction(
+            cpr_nummer="1234567890",
+            amount_in_dkk=1000,
+            afstem_noegle="e688d6a6fc65424483819520bbbe7745",
+            rate_text="",
+        ).split("\r\n")[1]
+        view = TenQLineView(line)
+        self.assertEqual(view.trans_type, "24")
+        self.assertEqual(view["debitor_nummer"], "1234567890")
+        self.assertEqual(view["rate_beloeb"], "0000100000+")
+        self.assertEqual(view["afstem_noegle"], "   e688d6a6fc65424483819520bbbe7745")
+        self.assertIn("rate_beloeb", view)
+        self.assertNotIn("person_nummer", view)
+        with self.assertRaises(KeyError):
+            view["person_nummer"]
+
+    def test_line_view_unrecognized_trans_type(self):
+        with self.assertRaises(ValueError):
+            TenQLineView(" 10Q99")
+
+    def test_record_views(self):
+        records = list(iter_10q_records(self.filename))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[1]["debitor_nummer"], "2222222222")
+        self.assertEqual(records[1]["rate_beloeb"], "0000020000-")
+        self.assertEqual(records[1]["10q_line_no"], [6, 7, 8, 9, 10])
+        self.assertIsNone(records[1].get("ean_lokationsnummer"))
+
+    def test_record_views_match_read_10q_file(self):
+        self.assertEqual(
+            [record.as_dict() for record in iter_10q_records(self.filename)],
+            read_10q_file(self.filename),
+        )
+
+    def test_dates(self):
+        record = next(iter_10q_records(self.filename))
+        self.assertEqual(record["forfald_dato"], "20220218")
+        self.assertEqual(record.get_date("forfald_dato"), date(2022, 2, 18))
+        self.assertEqual(record.get_date("betal_dato"), date(2022, 2, 21))
+        self.assertIsNone(record.get_date("unknown"))
+        self.assertEqual(record.lines[1].get_date("til_periode"), date(2022, 12, 31))
+        data = read_10q_file(self.filename, parse_dates=True)[0]
+        self.assertEqual(data["fra_periode"], date(2022, 1, 1))
+        self.assertEqual(data["stiftelse_dato"], date(2022, 2, 10))
+        self.assertEqual(data["debitor_nummer"], "1111111111")
+
+    def _debitors(self, **kwargs):
+        return [
+            record["debitor_nummer"]
+            for record in read_10q_file(self.filename, **kwargs)
+        ]
+
+    def test_filter_field_in(self):
+        self.assertEqual(
+            self._debitors(where=[FieldIn("debitor_nummer", {"3333333333", 1})]),
+            ["3333333333"],
+        )
+
+    def test_filter_field_in_zero_filled(self):
+        filename = self._write_file(
+            [
+                self.writer.serialize_transaction(
+                    cpr_nummer=cpr_nummer,
+                    amount_in_dkk=100,
+                    afstem_noegle="0042",
+                    rate_text="",
+                )
+                for cpr_nummer in ("123456789", "2222222222")
+            ]
+        )
+        for values in ({"123456789"}, {123456789}, {"0123456789"}):
+            with self.subTest(values=values):
+                records = read_10q_file(
+                    filename, where=[FieldIn("debitor_nummer", values)]
+                )
+                self.assertEqual(
+                    [record["debitor_nummer"] for record in records], ["0123456789"]
+                )
+        # Other fields are not zero-filled
+        self.assertEqual(
+            read_10q_file(filename, where=[FieldIn("afstem_noegle", {"42"})]), []
+        )
+        self.assertEqual(
+            len(read_10q_file(filename, where=[FieldIn("afstem_noegle", {"0042"})])),
+            2,
+        )
+
+    def test_filter_prefix(self):
+        self.assertEqual(
+            self._debitors(where=[FieldPrefix("afstem_noegle", "afstem-2")]),
+            ["2222222222"],
+        )
+
+    def test_filter_amount_range(self):
+        self.assertEqual(
+            self._debitors(where=[AmountRange(minimum=0)]),
+            ["1111111111", "3333333333"],
+        )
+        self.assertEqual(
+            self._debitors(where=[AmountRange(minimum=-20000, maximum=10000)]),
+            ["1111111111", "2222222222"],
+        )
+
+    def test_filter_callable(self):
+        self.assertEqual(
+            self._debitors(where=[lambda record: len(record["10q_line_no"]) == 5]),
+            ["1111111111", "2222222222", "3333333333"],
+        )
+
+    def test_filter_combined(self):
+        self.assertEqual(
+            self._debitors(
+                where=[
+                    AmountRange(minimum=0),
+                    FieldIn("debitor_nummer", {"2222222222", "3333333333"}),
+                ]
+            ),
+            ["3333333333"],
+        )
+
+    def test_filter_trans_types(self):
+        data = read_10q_file(self.filename, trans_types={"10", "24"})
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]["10q_line_no"], [1, 2])
+        self.assertNotIn("rate_text", data[0])
+        # A filter on a field from a line type that is not read matches nothing
+        self.assertEqual(
+            self._debitors(trans_types={"10"}, where=[AmountRange(minimum=0)]), []
+        )
+
+
+class TailTest(ReaderTestBase):
+    def setUp(self):
+        super().setUp()
+        with open(self.filename, "rb") as fp:
+            self.content = fp.read()
+        # Start with an empty file and append to it in the tests
+        self.filename = self._write_file([])
+        fd, self.state_filename = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(self.state_filename)
+        self.addCleanup(
+            lambda: os.path.exists(self.state_filename)
+            and os.remove(self.state_filename)
+        )
+
+    def _append(self, data: bytes):
+        with open(self.filename, "ab") as fp:
+            fp.write(data)
+
+    def _read(self, **kwargs):
+        tail = TenQFileTail(self.filename, state_filename=self.state_filename)
+        return [record["debitor_nummer"] for record in tail.read(**kwargs)]
+
+    def test_only_yields_completed_records(self):
+        blocks = self.content.split(b"\r\n 10Q10")
+        self.assertEqual(self._read(), [])
+        # The first block is only complete once the next type 10 line is written
+        self._append(blocks[0])
+        self.assertEqual(self._read(), [])
+        self._append(b"\r\n 10Q10" + blocks[1][:20])
+        self.assertEqual(self._read(), [])
+        self._append(blocks[1][20:] + b"\r\n")
+        self.assertEqual(self._read(), ["1111111111"])
+        self._append(b" 10Q10" + blocks[2])
+        self.assertEqual(self._read(), ["2222222222"])
+        self.assertEqual(self._read(), [])
+        self.assertEqual(self._read(final=True), ["3333333333"])
+        self.assertEqual(self._read(final=True), [])
+
+    def test_state_is_persisted(self):
+        self._append(self.content)
+        self.assertEqual(self._read(), ["1111111111", "2222222222"])
+        with open(self.state_filename) as fp:
+            state = json.load(fp)
+        self.assertEqual(state["10q_line_no"], 10)
+        self.assertEqual(state["offset"], self.content.index(b" 10Q10", 1000))
+        tail = TenQFileTail(self.filename, state_filename=self.state_filename)
+        self.assertEqual(tail.state, state)
+        records = list(tail.read(final=True))
+        self.assertEqual(records[0]["10q_line_no"], [11, 12, 13, 14, 15])
+        self.assertEqual(records[0].as_dict(), read_10q_file(self.filename)[-1])
+
+    def test_prisme_encoding(self):
+        with open(self.filename, "wb") as fp:
+            self.writer.write_transactions(
+                [("4444444444", 100, "afstem", "Betaling for år")], fp
+            )
+        records = list(TenQFileTail(self.filename).read(final=True))
+        self.assertEqual(records[0]["rate_text"].rstrip(), "Betaling for år")
+
+    def test_truncated_file_is_read_from_start(self):
+        self._append(self.content)
+        self.assertEqual(len(self._read(final=True)), 3)
+        with open(self.filename, "wb") as fp:
+            fp.write(self.content[:100])
+        self.assertEqual(self._read(final=True), ["1111111111"])
@@ -0,0 +1,153 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from tenQ.reader import iter_10q_records, read_10q_file
+from tenQ.sort import sort_10q_files
+from tenQ.writer import TenQTransactionWriter
+
+
+class SortTest(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.writer = TenQTransactionWriter(
+            leverandoer_ident="10Q",
+            due_date=date(2022, 2, 18),
+            year=2022,
+            timestamp=datetime(2022, 2, 18, 12, 35, 57, tzinfo=timezone.utc),
+            ean_lokationsnummer="9876543219876",
+        )
+        self.filenames = [
+            self._write_file(["5", "3", "9", "1"]),
+            self._write_file(["4", "3", "8"], ean=True),
+        ]
+        self.output_filename = self._tempfile()
+
+    def _tempfile(self):
+        fd, filename = tempfile.mkstemp(suffix=".10q")
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def _write_file(self, cpr_numbers, ean=False):
+        filename = self._tempfile()
+        with open(filename, "w", newline="") as fp:
+            fp.write(
+                "\r\n".join(
+                    self.writer.serialize_transaction(
+                        cpr_nummer=cpr_nummer,
+                        amount_in_dkk=100,
+                        afstem_noegle=f"key-{10 - int(cpr_nummer)}-{len(filename)}",
+                        rate_text=f"Text for\r\n{cpr_nummer}",
+                        ean_lokationsnummer="9876543219876" if ean else "",
+                    )
+                    for cpr_nummer in cpr_numbers
+                )
+            )
+        return filename
+
+    def _records(self, filename):
+        return [
+            {k: v for k, v in record.items() if k != "10q_line_no"}
+            for record in read_10q_file(filename)
+        ]
+
+    def _expected(self, key):
+        records = [
+            record for filename in self.filenames for record in self._records(filename)
+        ]
+        return sorted(records, key=lambda record: record[key].strip())
+
+    def test_sort_in_memory(self):
+        sort_10q_files(self.filenames, self.output_filename)
+        self.assertEqual(
+            self._records(self.output_filename), self._expected("debitor_nummer")
+        )
+
+    def test_sort_with_runs(self):
+        for key in ("debitor_nummer", "afstem_noegle"):
+            with self.subTest(key):
+                sort_10q_files(
+                    self.filenames,
+                    self.output_filename,
+                    key=key,
+                    max_records_in_memory=2,
+                    max_files_per_merge=2,
+                )
+                self.assertEqual(
+                    self._records(self.output_filename), self._expected(key)
+                )
+
+    def test_blocks_are_kept_intact(self):
+        sort_10q_files(self.filenames, self.output_filename, max_records_in_memory=3)
+        with open(self.output_filename, newline="") as fp:
+            lines = fp.read().split("\r\n")
+        # No line break after the last line
+        self.assertEqual(len(lines), 4 * 4 + 3 * 5)
+        self.assertNotEqual(lines[-1], "")
+        self.assertEqual(
+            [line[4:6] for line in lines[:10]],
+            ["10", "24", "26", "26", "10", "24", "26", "26", "10", "24"],
+        )
+        self.assertEqual(lines[4][33:43], "0000000003")
+        self.assertEqual(lines[8][33:43], "0000000003")
+        # Records with the same key keep their input order
+        self.assertEqual(lines[7][4:6], "26")
+        self.assertEqual(lines[12][4:6], "52")
+        self.assertEqual(lines[13], lines[0].replace("0000000001", "0000000004"))
+
+    def test_sorted_file_is_unchanged(self):
+        filename = self._write_file(["1", "3", "5"])
+        for max_records_in_memory in (10, 1):
+            with self.subTest(max_records_in_memory=max_records_in_memory):
+                sort_10q_files(
+                    [filename],
+                    self.output_filename,
+                    max_records_in_memory=max_records_in_memory,
+                )
+                with open(filename, "rb") as a, open(self.output_filename, "rb") as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_prisme_encoded_file(self):
+        filename = self._tempfile()
+        with open(filename, "wb") as fp:
+            self.writer.write_transactions(
+                [
+                    (cpr_nummer, 100, f"key-{cpr_nummer}", "Skat for året")
+                    for cpr_nummer in ("3", "1", "2")
+                ],
+                fp,
+            )
+        for max_records_in_memory in (10, 1):
+            with self.subTest(max_records_in_memory=max_records_in_memory):
+                sort_10q_files(
+                    [filename],
+                    self.output_filename,
+                    max_records_in_memory=max_records_in_memory,
+                )
+                records = list(iter_10q_records(self.output_filename))
+                self.assertEqual(
+                    [record["debitor_nummer"] for record in records],
+                    ["0000000001", "0000000002", "0000000003"],
+                )
+                self.assertEqual(records[0]["rate_text"].rstrip(), "Skat for året")
+                with open(self.output_filename, "rb") as fp:
+                    self.assertIn("Skat for året".encode("iso-8859-1"), fp.read())
+
+    def test_unrecognized_line(self):
+        with open(self.filenames[0], "a", newline="") as fp:
+            fp.write("\r\n 10Q99")
+        with self.assertRaises(ValueError):
+            sort_10q_files(self.filenames, self.output_filename)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            sort_10q_files(
+                self.filenames, self.output_filename, max_records_in_memory=0
+            )
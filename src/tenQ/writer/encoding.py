@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import io
+from typing import IO, Callable, Iterable, List, Optional
+
+# Files are uploaded to Prisme in this encoding
+PRISME_ENCODING = "iso-8859-1"
+
+# Takes a serialized line and a character position in it, and returns the name
+# of the field at that position
+FieldLocator = Callable[[str, int], str]
+
+
+class PrismeBuffer:
+    """Reusable buffer of serialized lines, encoded for upload to Prisme.
+
+    Lines are encoded as they are appended, so characters which cannot be
+    encoded are reported (with the name of the field they are in) when a
+    transaction is serialized, rather than when the file is uploaded.
+    """
+
+    def __init__(self, encoding: str = PRISME_ENCODING, separator: str = "\r\n"):
+        self.encoding = encoding
+        self.separator = separator.encode(encoding)
+        self.buffer = bytearray()
+
+    def append(self, text: str, locate_field: FieldLocator):
+        """Append `text` (one or more lines separated by "\\r\\n") to the buffer"""
+        try:
+            encoded = text.encode(self.encoding)
+        except UnicodeEncodeError as e:
+            # Find the line and the field containing the offending character
+            start = text.rfind("\r\n", 0, e.start)
+            start = 0 if start == -1 else start + 2
+            end = text.find("\r\n", e.start)
+            line = text[start:] if end == -1 else text[start:end]
+            field = locate_field(line, e.start - start)
+            raise ValueError(
+                f"Field {field} contains {text[e.start]!r}, "
+                f"which cannot be encoded as {self.encoding}"
+            ) from e
+        if self.buffer:
+            self.buffer += self.separator
+        self.buffer += encoded
+
+    def clear(self):
+        self.buffer.clear()
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self.buffer)
+
+    def write_to(self, fp: IO[bytes]) -> int:
+        """Write the contents of the buffer to the binary file `fp`"""
+        with self.getbuffer() as view:
+            return fp.write(view)
+
+    def open(self) -> io.BufferedReader:
+        """Return a file object reading the contents of the buffer without
+        copying it (e.g. for `tenQ.client.put_file_in_prisme_folder`.)
+        The buffer must not be changed while the file object is in use.
+        """
+        return io.BufferedReader(_BufferReader(self.getbuffer()))
+
+
+def write_lines(
+    lines: Iterable[str],
+    fp: IO,
+    locate_field: FieldLocator,
+    buffer_size: int = 65536,
+    encoding: str = PRISME_ENCODING,
+) -> int:
+    """Write serialized lines to the file object `fp`, separated by "\r\n".
+    Lines are collected in a buffer of about `buffer_size` characters before
+    being written. If `fp` is a binary file, the output is encoded with
+    `encoding`, using `locate_field` to report characters which cannot be encoded.
+    Returns the number of lines written.
+    """
+    prisme_buffer = None if isinstance(fp, io.TextIOBase) else PrismeBuffer(encoding)
+    buffer: List[str] = []
+    buffered = 0
+    count = 0
+    for line in lines:
+        if count:
+            buffer.append("\r\n")
+        buffer.append(line)
+        buffered += len(line)
+        count += 1
+        if buffered >= buffer_size:
+            _flush(fp, buffer, prisme_buffer, locate_field)
+            buffered = 0
+    _flush(fp, buffer, prisme_buffer, locate_field)
+    return count
+
+
+def _flush(
+    fp: IO,
+    buffer: List[str],
+    prisme_buffer: Optional[PrismeBuffer],
+    locate_field: FieldLocator,
+):
+    if buffer:
+        if prisme_buffer is None:
+            fp.writelines(buffer)
+        else:
+            prisme_buffer.clear()
+            prisme_buffer.append("".join(buffer), locate_field)
+            prisme_buffer.write_to(fp)
+        buffer.clear()
+
+
+class _BufferReader(io.RawIOBase):
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        size = min(len(b), len(self._view) - self._pos)
+        b[:size] = self._view[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def close(self):
+        self._view.release()
+        super().close()
@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Tuple
+
+from tenQ.writer.tenq import TenQTransactionWriter
+
+
+class TenQWriterFactory:
+    """Hands out `TenQTransactionWriter` instances, keeping the `maxsize` most
+    recently used ones, keyed by their constructor arguments.
+
+    Use this when a batch mixes several due dates, years etc., so a writer is
+    constructed once per distinct set of arguments instead of once per row.
+    An instance can be shared between threads.
+
+    Note that a writer created without a `timestamp` gets the time of its
+    creation, and keeps it for as long as it stays in the cache.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._writers: (
+            "OrderedDict[Tuple[Tuple[str, Hashable], ...], TenQTransactionWriter]"
+        ) = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, **kwargs) -> TenQTransactionWriter:
+        """Return a writer constructed with the keyword arguments `kwargs`"""
+        key = tuple(sorted(kwargs.items()))
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is not None:
+                self._writers.move_to_end(key)
+                return writer
+            writer = TenQTransactionWriter(**kwargs)
+            self._writers[key] = writer
+            if len(self._writers) > self.maxsize:
+                self._writers.popitem(last=False)
+            return writer
+
+    def clear(self):
+        with self._lock:
+            self._writers.clear()
+
+    def __len__(self) -> int:
+        return len(self._writers)
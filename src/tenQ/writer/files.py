@@ -0,0 +1,186 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+import hashlib
+import json
+import os
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from tenQ.writer.encoding import PRISME_ENCODING, PrismeBuffer
+from tenQ.writer.g68 import G68TransactionWriter
+from tenQ.writer.g69 import G69TransactionWriter
+from tenQ.writer.tenq import TenQTransactionWriter
+
+Writer = Union[TenQTransactionWriter, G68TransactionWriter, G69TransactionWriter]
+
+
+class SplitFileWriter:
+    """Writes transactions to a series of files in `directory`, starting a new
+    file when the current one has `max_transactions` transactions, or when the
+    next transaction would make it larger than `max_bytes` bytes.
+
+    A transaction is never split between files, so a 10Q type 10 block always
+    stays together with its 24/26/52 lines. For G68 and G69 writers, the line
+    numbers start over in each file.
+
+    Each file is described by an entry in `manifest` once it is complete, and
+    `on_file_complete` (if given) is called with the entry, so the file can be
+    uploaded while the following files are being written.
+    """
+
+    def __init__(
+        self,
+        writer: Writer,
+        directory: str,
+        filename_pattern: str = "{index:04d}.txt",
+        max_transactions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        method: str = "serialize_transaction",
+        encoding: str = PRISME_ENCODING,
+        on_file_complete: Optional[Callable[[Dict], None]] = None,
+    ):
+        if max_transactions is not None and max_transactions < 1:
+            raise ValueError("max_transactions must be at least 1")
+        self.writer = writer
+        self.directory = directory
+        self.filename_pattern = filename_pattern
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.on_file_complete = on_file_complete
+        self.manifest: List[Dict] = []
+
+        self._serialize = getattr(writer, method)
+        self._buffer = PrismeBuffer(encoding)
+        self._fp: Optional[IO[bytes]] = None
+        self._filename = ""
+        self._transactions = 0
+        self._bytes = 0
+        self._hash = hashlib.sha256()
+
+    def _encode(self, args, kwargs) -> memoryview:
+        self._buffer.clear()
+        self._buffer.append(self._serialize(*args, **kwargs), self.writer.locate_field)
+        return self._buffer.getbuffer()
+
+    def _open(self):
+        self._filename = os.path.join(
+            self.directory, self.filename_pattern.format(index=len(self.manifest) + 1)
+        )
+        self._fp = open(self._filename, "wb")
+        self._transactions = 0
+        self._bytes = 0
+        self._hash = hashlib.sha256()
+
+    def _reset_line_number(self):
+        # Each file is numbered from the start
+        reset_line_number = getattr(self.writer, "reset_line_number", None)
+        if reset_line_number is not None:
+            reset_line_number()
+
+    def _close(self):
+        if self._fp is None:
+            return
+        self._fp.close()
+        self._fp = None
+        entry = {
+            "filename": self._filename,
+            "transactions": self._transactions,
+            "bytes": self._bytes,
+            "sha256": self._hash.hexdigest(),
+        }
+        self.manifest.append(entry)
+        if self.on_file_complete is not None:
+            self.on_file_complete(entry)
+
+    def _discard(self):
+        # Remove the current (incomplete) file without reporting it
+        if self._fp is None:
+            return
+        self._fp.close()
+        self._fp = None
+        os.remove(self._filename)
+
+    def _is_full(self, size: int) -> bool:
+        if self._transactions == 0:
+            return False
+        if (
+            self.max_transactions is not None
+            and self._transactions >= self.max_transactions
+        ):
+            return True
+        separator = len(self._buffer.separator)
+        return self.max_bytes is not None and (
+            self._bytes + separator + size > self.max_bytes
+        )
+
+    def write(self, *args, **kwargs):
+        """Serialize one transaction (with the writer method given by `method`)
+        and write it to the current file, or to a new file if it is full.
+        """
+        # A file is only opened once its first transaction has been serialized,
+        # so a failing transaction never leaves an empty file behind
+        if self._fp is None:
+            self._reset_line_number()
+            data = self._encode(args, kwargs)
+            self._open()
+        else:
+            data = self._encode(args, kwargs)
+            if self._is_full(len(data)):
+                data.release()
+                self._close()
+                self._reset_line_number()
+                # Serialize again, so the transaction gets the line numbers of
+                # the new file
+                data = self._encode(args, kwargs)
+                self._open()
+        with data:
+            if self._transactions:
+                self._write(self._buffer.separator)
+            self._write(data)
+        self._transactions += 1
+
+    def _write(self, data):
+        self._fp.write(data)  # type: ignore[union-attr]
+        self._hash.update(data)
+        self._bytes += len(data)
+
+    def write_rows(self, rows: Iterable[Union[Mapping, Sequence]]):
+        """Write many transactions. Each row holds the arguments for one
+        transaction, either as a dict or a tuple.
+        """
+        for row in rows:
+            if isinstance(row, Mapping):
+                self.write(**row)
+            else:
+                self.write(*row)
+
+    def close(self) -> List[Dict]:
+        """Finish the current file, and return the manifest"""
+        self._close()
+        return self.manifest
+
+    def write_manifest(self, filename: str):
+        with open(filename, "w") as fp:
+            json.dump(self.manifest, fp, indent=2)
+
+    def __enter__(self) -> "SplitFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Files which are only partly written must not be reported (and
+            # e.g. uploaded) as complete
+            self._discard()
@@ -1,10 +1,30 @@
 # SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
 #
 # SPDX-License-Identifier: MPL-2.0
-from datetime import date, datetime
+from datetime import date
 from enum import Enum
+from functools import lru_cache
 from operator import attrgetter
-from typing import Generator, List, Optional, Type, Union
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+
+from tenQ import datecodec
+from tenQ.writer.encoding import PRISME_ENCODING, PrismeBuffer, write_lines
+from tenQ.writer.linenumbers import LineNumberAllocator
 
 _not_implemented = NotImplementedError("must be implemented by subclass")
 
@@ -106,13 +126,13 @@ class DateField(Field):
     datatype = date
     length = 8  # length of serialized output
 
-    _format = "%Y%m%d"
+    _format = datecodec.DATE_FORMAT
 
     def __init__(self, val: date):
         if not isinstance(val, date):
             raise TypeError(f"{val!r} is not a `date` instance")
         self._val = val
-        self._formatted_val = val.strftime(self._format)
+        self._formatted_val = datecodec.format_date(val)
         assert len(self._formatted_val) == self.length
 
     @property
@@ -121,7 +141,7 @@ class DateField(Field):
 
     @classmethod
     def from_str(cls, val: str) -> "DateField":
-        return cls(datetime.strptime(val, cls._format).date())
+        return cls(datecodec.parse_date(val))
 
 
 class EnumField(ZeroPaddedNumericField):
@@ -160,6 +180,9 @@ class FloatingFieldMixin:
     # These class attributes are private and used for internal bookkeeping
     _id_cls_map: dict = dict()
     _required: set = set()
+    # Bit N is set when the field with ID N is required. Kept up to date as
+    # subclasses are registered, so validation needs no sets.
+    _required_mask: int = 0
     _id_length = 2
 
     @property
@@ -187,19 +210,35 @@ class FloatingFieldMixin:
 
         if required is True:
             FloatingFieldMixin._required.add(cls)
+            FloatingFieldMixin._required_mask |= 1 << cls_id
 
     @classmethod
-    def validate_required_fields(cls, fields: List["FloatingFieldMixin"]):
-        required_ids: set = set(f.id for f in cls._required)
-        field_ids: set = set(f.id for f in fields)
-        missing: list = [
-            subclass.__name__
-            for subclass in cls._required
-            if subclass.id in (required_ids - field_ids)
-        ]
-        if missing:
+    def validate_required_fields(cls, fields: Sequence["FloatingFieldMixin"]):
+        field_mask = 0
+        for f in fields:
+            field_mask |= 1 << f.id
+        missing_mask = cls._required_mask & ~field_mask
+        if missing_mask:
+            missing: list = [
+                subclass.__name__
+                for subclass in sorted(cls._required, key=attrgetter("id"))
+                if missing_mask & (1 << subclass.id)
+            ]
             raise ValueError(f"The following required fields are missing: {missing}")
 
+    @staticmethod
+    def in_id_order(fields: List["FloatingFieldMixin"]) -> List["FloatingFieldMixin"]:
+        """Return `fields` ordered by ID, which is the order they are
+        serialized in. Lists that are already in order (like those built by
+        `G68Transaction`) are returned as is, so this is usually only a check.
+        """
+        previous = -1
+        for f in fields:
+            if f.id < previous:
+                return sorted(fields, key=attrgetter("id"))
+            previous = f.id
+        return fields
+
     @classmethod
     def parse(cls, line: str, *expected_fields: Type[Field]) -> Generator:
         remainder = line[line.index("&") :]
@@ -392,6 +431,242 @@ class BetalingstekstLinje(FloatingFieldMixin, StringField):
             for field_id, line in enumerate(lines, start=cls._min_id)
         ]
 
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def tuple_from_text(cls, text: str) -> Tuple["BetalingstekstLinje", ...]:
+        """Same as `list_from_text`, but cached, as most transactions in a run
+        share the same text. The instances are shared, so they must not be
+        modified.
+        """
+        return tuple(cls.list_from_text(text))
+
+
+def _floating_prefix(cls: Type[FloatingFieldMixin]) -> str:
+    return "&" + str(cls.id).zfill(FloatingFieldMixin._id_length)
+
+
+def _format_distinct(formatter: Callable[[Any], str], column: Iterable) -> List[str]:
+    # Format each distinct value in `column` once. Values are keyed by type as
+    # well, as e.g. `True == 1` but they are serialized differently.
+    formatted: Dict[Tuple[type, Any], str] = {}
+    result = []
+    for value in column:
+        key = (type(value), value)
+        value_formatted = formatted.get(key)
+        if value_formatted is None:
+            value_formatted = formatted[key] = formatter(value)
+        result.append(value_formatted)
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _render_text(text: str) -> str:
+    return "".join(
+        map(attrgetter("serialized_value"), BetalingstekstLinje.tuple_from_text(text))
+    )
+
+
+class G68LineSerializer:
+    """Serializer for G68 lines, compiled from a `G68TransactionWriter`.
+
+    The fields which are the same on every line (including those given to the
+    writer) are rendered once, in the order used by `G68Transaction`. Serializing
+    a line then checks and formats the arguments with plain string operations,
+    and joins them with the pre-rendered parts. Arguments which are not of the
+    expected type (or fail the checks) are passed to their `Field` class
+    instead, so the output and errors are the same as those of
+    `G68Transaction.serialized_value`.
+    """
+
+    __slots__ = ("_head", "_middle", "_machine_id")
+
+    # Pre-rendered enum members
+    _transaction_types = {
+        member: Transaktionstype(member).serialized_value
+        for member in TransaktionstypeEnum
+    }
+    _recipient_types = {
+        member: UdbetalingsberettigetIdentKode(member).serialized_value
+        for member in UdbetalingsberettigetIdentKodeEnum
+    }
+
+    _amount_prefix = _floating_prefix(Udbetalingsbeløb)
+    # `G68Transaction` takes the sign from the amount stored in
+    # `Udbetalingsbeløb`, which is absolute
+    _sign = Fortegnsmarkering("+").serialized_value
+    _recipient_prefix = _floating_prefix(Udbetalingsberettiget)
+    _payment_date_prefix = _floating_prefix(Udbetalingsdato)
+    _posting_reference_prefix = _floating_prefix(Posteringshenvisning)
+    _invoice_no_prefix = _floating_prefix(Fakturanummer)
+
+    def __init__(self, writer: "G68TransactionWriter"):
+        self._head = writer.reg.serialized_value + Snitfladetype("G68").serialized_value
+        # The floating marker and the floating fields before `Udbetalingsbeløb`
+        self._middle = (
+            FlydendeEllerFast(1).serialized_value
+            + writer.org.serialized_value
+            + Organisationstype(0).serialized_value
+            + UdIdent(0).serialized_value
+        )
+        self._machine_id = writer.machine_id.serialized_value
+
+    # Formatters for each argument. Each returns the serialized field,
+    # including the "&NN" prefix of floating fields.
+
+    @classmethod
+    def format_transaction_type(cls, value: TransaktionstypeEnum) -> str:
+        if type(value) is TransaktionstypeEnum:
+            return cls._transaction_types[value]
+        return Transaktionstype(value).serialized_value
+
+    @classmethod
+    def format_recipient_type(cls, value: UdbetalingsberettigetIdentKodeEnum) -> str:
+        if type(value) is UdbetalingsberettigetIdentKodeEnum:
+            return cls._recipient_types[value]
+        return UdbetalingsberettigetIdentKode(value).serialized_value
+
+    @classmethod
+    def format_recipient(cls, value: str) -> str:
+        value = int(value)
+        formatted = str(value)
+        if len(formatted) > Udbetalingsberettiget.length:
+            return Udbetalingsberettiget(value).serialized_value
+        return cls._recipient_prefix + formatted.zfill(Udbetalingsberettiget.length)
+
+    @classmethod
+    def format_amount(cls, value: int) -> str:
+        formatted = str(abs(value * 100))
+        if type(value) is int and len(formatted) <= Udbetalingsbeløb.length:
+            return cls._amount_prefix + formatted.zfill(Udbetalingsbeløb.length)
+        return Udbetalingsbeløb(value).serialized_value
+
+    @staticmethod
+    def _format_date(value: date) -> Optional[str]:
+        if type(value) is date:
+            formatted = datecodec.format_date(value)
+            if len(formatted) == DateField.length:
+                return formatted
+        return None
+
+    @classmethod
+    def format_payment_date(cls, value: date) -> str:
+        formatted = cls._format_date(value)
+        if formatted is None:
+            return Udbetalingsdato(value).serialized_value
+        return cls._payment_date_prefix + formatted
+
+    @classmethod
+    def format_posting_date(cls, value: date) -> str:
+        formatted = cls._format_date(value)
+        if formatted is None:
+            return Posteringsdato(value).serialized_value
+        return formatted
+
+    @classmethod
+    def format_invoice_no(cls, value: str) -> str:
+        if (
+            type(value) is str
+            and len(value) <= Fakturanummer.length
+            and "&" not in value
+            and "!" not in value
+            and "\\" not in value
+        ):
+            return cls._invoice_no_prefix + value
+        return Fakturanummer(value).serialized_value
+
+    @staticmethod
+    def format_text(value: str) -> str:
+        return _render_text(value)
+
+    @staticmethod
+    def format_line_no(value: int) -> str:
+        formatted = str(value)
+        if len(formatted) > Linjeløbenummer.length:
+            return Linjeløbenummer(value).serialized_value
+        return formatted.zfill(Linjeløbenummer.length)
+
+    def join(
+        self,
+        line_no: str,
+        transaction_type: str,
+        recipient_type: str,
+        recipient: str,
+        amount: str,
+        payment_date: str,
+        posting_date: str,
+        invoice_no: str,
+        text: str,
+    ) -> str:
+        """Join formatted arguments into a line"""
+        return "".join(
+            (
+                self._head,
+                line_no,
+                transaction_type,
+                self._middle,
+                amount,
+                self._sign,
+                recipient_type,
+                recipient,
+                payment_date,
+                self._posting_reference_prefix,
+                posting_date,
+                self._machine_id,
+                line_no,
+                invoice_no,
+                text,
+            )
+        )
+
+    def format_arguments(
+        self,
+        transaction_type: TransaktionstypeEnum,
+        recipient_type: UdbetalingsberettigetIdentKodeEnum,
+        recipient: str,
+        amount: int,
+        payment_date: date,
+        posting_date: date,
+        invoice_no: str,
+        text: str,
+    ) -> Tuple[str, ...]:
+        """Format all arguments except the line number, for `join`"""
+        # The arguments are checked in the same order as `G68TransactionWriter`
+        # constructs their fields
+        return (
+            self.format_transaction_type(transaction_type),
+            self.format_recipient_type(recipient_type),
+            self.format_recipient(recipient),
+            self.format_amount(amount),
+            self.format_payment_date(payment_date),
+            self.format_posting_date(posting_date),
+            self.format_invoice_no(invoice_no),
+            self.format_text(text),
+        )
+
+    def serialize(
+        self,
+        line_no: int,
+        transaction_type: TransaktionstypeEnum,
+        recipient_type: UdbetalingsberettigetIdentKodeEnum,
+        recipient: str,
+        amount: int,
+        payment_date: date,
+        posting_date: date,
+        invoice_no: str,
+        text: str,
+    ) -> str:
+        formatted = self.format_arguments(
+            transaction_type,
+            recipient_type,
+            recipient,
+            amount,
+            payment_date,
+            posting_date,
+            invoice_no,
+            text,
+        )
+        return self.join(self.format_line_no(line_no), *formatted)
+
 
 class G68TransactionWriter:
     def __init__(
@@ -399,15 +674,23 @@ class G68TransactionWriter:
         registreringssted: int,
         organisationsenhed: int,
         maskinnummer: Optional[int] = None,
+        line_numbers: Optional[LineNumberAllocator] = None,
     ):
         self.reg = Registreringssted(registreringssted)
         self.org = Organisationsenhed(organisationsenhed)
         self.machine_id = Maskinnummer(0 if maskinnummer is None else maskinnummer)
-        self._line_no = 1
+        # May be shared with other writers, or reserved from a shared allocator
+        self.line_numbers = (
+            LineNumberAllocator() if line_numbers is None else line_numbers
+        )
+        self._serializer = G68LineSerializer(self)
 
     @property
     def line_no(self) -> int:
-        return self._line_no
+        return self.line_numbers.next
+
+    def reset_line_number(self, line_number: int = 1):
+        self.line_numbers.reset(line_number)
 
     def serialize_transaction(
         self,
@@ -420,22 +703,152 @@ class G68TransactionWriter:
         invoice_no: str,
         text: str,
     ) -> str:
-        transaction = G68Transaction(
-            self,
-            Transaktionstype(transaction_type),
-            UdbetalingsberettigetIdentKode(recipient_type),
-            Udbetalingsberettiget(int(recipient)),
-            Udbetalingsbeløb(amount),
-            Udbetalingsdato(payment_date),
-            Posteringsdato(posting_date),
-            Fakturanummer(invoice_no),
-            BetalingstekstLinje.list_from_text(text),
+        serializer = self._serializer
+        formatted = serializer.format_arguments(
+            transaction_type,
+            recipient_type,
+            recipient,
+            amount,
+            payment_date,
+            posting_date,
+            invoice_no,
+            text,
+        )
+        # The line number is only taken once the transaction is known to be
+        # valid, so a failing transaction leaves no gap in the numbering
+        line_no = self.line_numbers.allocate()
+        try:
+            line_no_value = serializer.format_line_no(line_no)
+        except Exception:
+            self.line_numbers.release(line_no)
+            raise
+        return serializer.join(line_no_value, *formatted)
+
+    def serialize_transactions(
+        self, rows: Iterable[Union[Mapping, Sequence]]
+    ) -> Iterator[str]:
+        """Lazily serialize many transactions, yielding one line at a time.
+        Each row holds the arguments for `serialize_transaction`, either as a
+        dict or a tuple.
+        """
+        serialize = self.serialize_transaction
+        for row in rows:
+            if isinstance(row, Mapping):
+                yield serialize(**row)
+            else:
+                yield serialize(*row)
+
+    def write_transactions(
+        self,
+        rows: Iterable[Union[Mapping, Sequence]],
+        fp: IO,
+        buffer_size: int = 65536,
+        encoding: str = PRISME_ENCODING,
+    ) -> int:
+        """Serialize many transactions directly to the file object `fp`.
+        The output is the same as joining the results of `serialize_transaction`
+        with "\\r\\n". See `tenQ.writer.encoding.write_lines` for the other
+        arguments. Returns the number of lines written.
+        """
+        return write_lines(
+            self.serialize_transactions(rows),
+            fp,
+            self.locate_field,
+            buffer_size,
+            encoding,
         )
-        self._line_no += 1
-        return transaction.serialized_value
+
+    def serialize_columns(
+        self,
+        transaction_type: Sequence,
+        recipient_type: Sequence,
+        recipient: Sequence,
+        amount: Sequence,
+        payment_date: Sequence,
+        posting_date: Sequence,
+        invoice_no: Sequence,
+        text: Sequence,
+    ) -> List[str]:
+        """Serialize a batch of transactions given as columns (lists, tuples,
+        arrays, ...) of equal length, rather than one row at a time.
+
+        Each column is formatted as a whole. The enum codes, dates and texts
+        are formatted once for each distinct value, as they rarely differ
+        within a batch. The transactions get consecutive line numbers.
+        Returns one line per transaction, the same as `serialize_transaction`.
+        """
+        columns = (
+            transaction_type,
+            recipient_type,
+            recipient,
+            amount,
+            payment_date,
+            posting_date,
+            invoice_no,
+            text,
+        )
+        count = len(transaction_type)
+        if any(len(column) != count for column in columns):
+            raise ValueError("All columns must have the same length")
+        if not count:
+            return []
+
+        serializer = self._serializer
+        formatted = (
+            _format_distinct(serializer.format_transaction_type, transaction_type),
+            _format_distinct(serializer.format_recipient_type, recipient_type),
+            list(map(serializer.format_recipient, recipient)),
+            list(map(serializer.format_amount, amount)),
+            _format_distinct(serializer.format_payment_date, payment_date),
+            _format_distinct(serializer.format_posting_date, posting_date),
+            list(map(serializer.format_invoice_no, invoice_no)),
+            list(map(serializer.format_text, text)),
+        )
+        # As in `serialize_transaction`, the line numbers are taken last
+        first = self.line_numbers.allocate(count)
+        try:
+            # Check that the last line number fits
+            serializer.format_line_no(first + count - 1)
+        except Exception:
+            self.line_numbers.release(first, count)
+            raise
+        line_nos = map(serializer.format_line_no, range(first, first + count))
+        return list(map(serializer.join, line_nos, *formatted))
+
+    def serialize_transaction_bytes(
+        self, buffer: PrismeBuffer, *args, **kwargs
+    ) -> PrismeBuffer:
+        """Serialize a transaction (taking the same arguments as
+        `serialize_transaction`) and append it to `buffer` in its encoding.
+        """
+        buffer.append(self.serialize_transaction(*args, **kwargs), self.locate_field)
+        return buffer
+
+    @staticmethod
+    def locate_field(line: str, pos: int) -> str:
+        """Name of the field at position `pos` in a serialized line"""
+        start = line.rfind("&", 0, pos + 1)
+        if start == -1:
+            for name, (cls, slc) in G68TransactionView._fixed.items():
+                if slc.start <= pos < slc.stop:
+                    return name
+            return "unknown"
+        field_id = int(line[start + 1 : start + 1 + FloatingFieldMixin._id_length])
+        if 1 <= field_id < 40 and field_id in FloatingFieldMixin._id_cls_map:
+            return FloatingFieldMixin._id_cls_map[field_id].__name__
+        return BetalingstekstLinje.__name__
 
 
 class G68Transaction(Serializable):
+    # Fixed fields at the start of each line, in order
+    fixed_field_types: Tuple[Type[Field], ...] = (
+        Registreringssted,
+        Snitfladetype,
+        Linjeløbenummer,
+        Transaktionstype,
+        FlydendeEllerFast,
+    )
+
     def __init__(
         self,
         writer: G68TransactionWriter,
@@ -446,7 +859,7 @@ class G68Transaction(Serializable):
         payment_date: Udbetalingsdato,
         posting_date: Posteringsdato,
         invoice_no: Fakturanummer,
-        text: List[BetalingstekstLinje],
+        text: Sequence[BetalingstekstLinje],
     ):
         self._writer = writer
 
@@ -478,7 +891,7 @@ class G68Transaction(Serializable):
         all_fields = (
             self.fixed_fields
             + [self.floating_marker]
-            + sorted(self.floating_fields, key=attrgetter("id"))
+            + FloatingFieldMixin.in_id_order(self.floating_fields)
         )
         return "".join(map(attrgetter("serialized_value"), all_fields))
 
@@ -493,6 +906,7 @@ class G68Transaction(Serializable):
 
     @property
     def floating_fields(self) -> List[FloatingFieldMixin]:
+        # In ID order, so they need no sorting before serialization
         fields: List[FloatingFieldMixin] = [
             self._writer.org,
             self.organisation_type,
@@ -520,13 +934,107 @@ class G68Transaction(Serializable):
     @classmethod
     def parse(cls, line: str) -> Generator[Field, None, None]:
         # Read fixed fields
-        yield from Field.parse(
-            line,
-            Registreringssted,
-            Snitfladetype,
-            Linjeløbenummer,
-            Transaktionstype,
-            FlydendeEllerFast,
-        )
+        yield from Field.parse(line, *cls.fixed_field_types)
         # Read floating fields
         yield from FloatingFieldMixin.parse(line)
+
+
+def _fixed_field_slices(
+    fields: Tuple[Type[Field], ...],
+) -> Dict[str, Tuple[Type[Field], slice]]:
+    result = {}
+    pos = 0
+    for cls in fields:
+        assert isinstance(cls.length, int)
+        result[cls.__name__] = (cls, slice(pos, pos + cls.length))
+        pos += cls.length
+    return result
+
+
+class G68TransactionView:
+    """Read-only view of a single serialized G68 line.
+
+    Unlike `G68Transaction.parse`, nothing is decoded up front: a field is only
+    parsed (using the `from_str` of its `Field` class) the first time it is
+    looked up, and the result is cached. Fields are looked up by `Field`
+    subclass, by class name (e.g. `"Udbetalingsbeløb"`), or by floating field ID
+    (which is the only way to get at the individual `BetalingstekstLinje` lines.)
+    """
+
+    __slots__ = ("line", "_floating", "_cache")
+
+    # Class name -> (class, slice) for the fixed fields
+    _fixed = _fixed_field_slices(G68Transaction.fixed_field_types)
+
+    def __init__(self, line: str):
+        self.line = line
+        self._floating: Optional[Dict[int, Tuple[int, int]]] = None
+        self._cache: Dict[Union[str, int], Field] = {}
+
+    def _index_floating(self) -> Dict[int, Tuple[int, int]]:
+        # Find the start and end of each floating field value, without
+        # splitting the line or decoding anything.
+        line = self.line
+        id_length = FloatingFieldMixin._id_length
+        floating = {}
+        start = line.find("&")
+        while start != -1:
+            end = line.find("&", start + 1)
+            field_id = int(line[start + 1 : start + 1 + id_length])
+            floating[field_id] = (
+                start + 1 + id_length,
+                len(line) if end == -1 else end,
+            )
+            start = end
+        self._floating = floating
+        return floating
+
+    def _resolve(self, key: Union[Type[Field], str, int]) -> Union[str, int]:
+        # Fixed fields are keyed by class name, floating fields by ID
+        if isinstance(key, type):
+            key = key.__name__
+        if isinstance(key, str) and key not in self._fixed:
+            for field_id, cls in FloatingFieldMixin._id_cls_map.items():
+                if cls.__name__ == key:
+                    return field_id
+            raise KeyError(key)
+        return key
+
+    def _raw(self, key: Union[str, int]) -> str:
+        if isinstance(key, str):
+            return self.line[self._fixed[key][1]]
+        floating = self._floating
+        if floating is None:
+            floating = self._index_floating()
+        start, end = floating[key]
+        return self.line[start:end]
+
+    def raw(self, key: Union[Type[Field], str, int]) -> str:
+        """Return the raw (undecoded) string value of a field"""
+        return self._raw(self._resolve(key))
+
+    def __getitem__(self, key: Union[Type[Field], str, int]) -> Field:
+        key = self._resolve(key)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        raw = self._raw(key)
+        field: Field
+        if isinstance(key, str):
+            field = self._fixed[key][0].from_str(raw)
+        elif 1 <= key < 40:
+            field = FloatingFieldMixin._id_cls_map[key].from_str(raw)
+        else:
+            field = BetalingstekstLinje(raw, key)
+        self._cache[key] = field
+        return field
+
+    def get(self, key: Union[Type[Field], str, int], default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: {self.line!r}>"
@@ -5,6 +5,24 @@
 from collections import OrderedDict
 from datetime import date, datetime
 from decimal import Decimal
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from tenQ import datecodec
+from tenQ.writer.encoding import PrismeBuffer
+from tenQ.writer.linenumbers import LineNumberAllocator
 
 
 class G69TransactionWriter(object):
@@ -66,6 +84,13 @@ class G69TransactionWriter(object):
         }
     )
 
+    # Field names by code
+    names_by_code = {config[0]: name for name, config in fields.items()}
+
+    # Serialized `deb_kred` of debit and credit lines
+    _debit = str(fields["deb_kred"][0]).rjust(3, "0") + "D"
+    _credit = str(fields["deb_kred"][0]).rjust(3, "0") + "K"
+
     # Set of required codes
     required = set([name for name, config in fields.items() if config[3]])
 
@@ -106,57 +131,122 @@ class G69TransactionWriter(object):
         "is_kredit": {"field": "deb_kred", "map": {False: "D", True: "K"}},
     }
 
+    # Names of the methods formatting values of each type (other values are
+    # formatted with `str`)
+    formatters = {
+        int: "format_nummer",
+        date: "format_date",
+        Decimal: "format_amount_kr",
+    }
+
     registreringssted = 0
     snitfladetype = "G69"
     organisationsenhed = 0
     organisationstype = 1
     linjeformat = "FLYD"
 
-    def __init__(self, registreringssted: int, organisationsenhed: int):
+    def __init__(
+        self,
+        registreringssted: int,
+        organisationsenhed: int,
+        line_numbers: Optional[LineNumberAllocator] = None,
+    ):
         self.registreringssted = registreringssted
         self.organisationsenhed = organisationsenhed
 
-        # Line number in the file; successive calls to serialize_transaction increment this.
-        # Be sure to use a new G69TransactionWriter or reset the line number when writing a new file
-        self.line_number = 1
+        # Line numbers in the file; successive calls to serialize_transaction increment this.
+        # Be sure to use a new G69TransactionWriter or reset the line number when writing a new file.
+        # May be shared with other writers, or reserved from a shared allocator.
+        self.line_numbers = (
+            LineNumberAllocator() if line_numbers is None else line_numbers
+        )
+
+    @property
+    def line_number(self) -> int:
+        # The line number of the next transaction
+        return self.line_numbers.next
+
+    @line_number.setter
+    def line_number(self, line_number: int):
+        self.line_numbers.reset(line_number)
 
-    def reset_line_number(self):
-        self.line_number = 1
+    def reset_line_number(self, line_number: int = 1):
+        self.line_numbers.reset(line_number)
 
     def serialize_transaction(self, post_type: str = "NOR", **kwargs):
-        output = []
+        post_type = self._check_post_type(post_type)
+        self._resolve_aliases(kwargs)
+        fields = self._format_fields(kwargs)
+        # The line number is only allocated once the transaction is valid
+        return "&".join(
+            [self._header(post_type, self.line_numbers.allocate()), *fields]
+        )
+
+    @staticmethod
+    def _check_post_type(post_type: str) -> str:
         post_type = post_type.upper()
         if post_type not in ("NOR", "PRI", "SUP"):
             raise ValueError("post_type must be NOR, PRI or SUP")
+        return post_type
 
+    def _resolve_aliases(self, kwargs: Dict[str, Any]):
         for alias, config in self.aliases.items():
             if alias in kwargs:
                 name = config["field"]
                 if kwargs[alias] in config["map"]:
                     kwargs[name] = config["map"][kwargs[alias]]
 
-        # Header
-        output.append(
+    def _header_parts(self, post_type: str) -> Tuple[str, str]:
+        # The parts of the header before and after the line number
+        return (
+            str(self.registreringssted).rjust(3, "0") + self.snitfladetype,
             "".join(
                 [
-                    str(self.registreringssted).rjust(3, "0"),
-                    self.snitfladetype,
-                    str(self.line_number).rjust(5, "0"),
                     str(self.organisationsenhed).rjust(4, "0"),
                     str(self.organisationstype).rjust(2, "0"),
                     post_type,
                     self.linjeformat,
                 ]
-            )
+            ),
         )
 
-        present_fields = set([name for name in self.fields if name in kwargs])
+    def _header(self, post_type: str, line_number: int) -> str:
+        before, after = self._header_parts(post_type)
+        return before + str(line_number).rjust(5, "0") + after
+
+    def _format_fields(self, kwargs: Dict[str, Any]) -> List[str]:
+        # Serialized fields ("NNNvalue") of a transaction, in output order
+        output = []
+        for name, code, width, required_type, pad, format_value in self._plan(
+            frozenset(kwargs)
+        ):
+            value = kwargs[name]
+            if not isinstance(value, required_type):
+                value = self._coerce(name, value, required_type)
+            value = format_value(value)
+            if "&" in value:
+                raise ValueError(f"Value {name}={value} may not contain &")
+            if len(value) > width:
+                raise ValueError(f"Value {name}={value} may not exceed length {width}")
+            output.append(code + value.rjust(pad, "0"))
+        return output
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _plan(
+        cls, keys: FrozenSet[str]
+    ) -> Tuple[Tuple[str, str, int, type, int, Callable[[object], str]], ...]:
+        # Serialization plan for transactions with the arguments `keys` (after
+        # resolving aliases). Validates the combination of fields, and returns
+        # (name, rendered code, width, type, padding, formatter) for each field
+        # in output order. Cached, as rows almost always have the same keys.
+        present_fields = set([name for name in cls.fields if name in keys])
 
-        for name in self.required:
-            if name not in kwargs:
+        for name in cls.required:
+            if name not in keys:
                 raise ValueError(f"Field {name} required")
 
-        for name, required in self.required_together.items():
+        for name, required in cls.required_together.items():
             if name in present_fields:
                 if not all([r in present_fields for r in required]):
                     raise ValueError(
@@ -164,7 +254,7 @@ class G69TransactionWriter(object):
                         + (", ".join(required))
                     )
 
-        for name, excluded in self.mutually_exclusive.items():
+        for name, excluded in cls.mutually_exclusive.items():
             if name in present_fields:
                 if any([e in present_fields for e in excluded]):
                     raise ValueError(
@@ -172,64 +262,220 @@ class G69TransactionWriter(object):
                         + (", ".join(excluded))
                     )
 
-        # data
-        for name, config in self.fields.items():
+        plan = []
+        for name, config in cls.fields.items():
             (code, width, required_type, required, pad) = config
-            if name not in kwargs:
-                if required:
-                    raise KeyError(name)
+            if name not in keys:
+                continue
+            if pad:
+                if isinstance(pad, bool):
+                    # `pad` is True - use `width` to set the padding
+                    pad = width
+                # otherwise `pad` is an int - use `pad` to set the padding
             else:
-                value = kwargs[name]
-                if not isinstance(value, required_type):
-                    if required_type is Decimal and isinstance(value, int):
-                        value = Decimal(value)
-                    elif required_type is str and isinstance(value, int):
-                        value = str(value)
-                    else:
-                        raise ValueError(
-                            f"{name}={value} must be of type {required_type}"
-                        )
-                if required_type == int:
-                    value = G69TransactionWriter.format_nummer(value)
-                elif required_type == date:
-                    value = G69TransactionWriter.format_date(value)
-                elif required_type == Decimal:
-                    value = G69TransactionWriter.format_amount_kr(value)
-                else:
-                    value = str(value)
-                if "&" in value:
-                    raise ValueError(f"Value {name}={value} may not contain &")
-                if len(value) > width:
-                    raise ValueError(
-                        f"Value {name}={value} may not exceed length {width}"
-                    )
-                if pad:
-                    if isinstance(pad, bool):
-                        # `pad` is True - use `width` to set the padding
-                        value = value.rjust(width, "0")
-                    else:
-                        # `pad` is an int - use `pad` to set the padding
-                        value = value.rjust(pad, "0")
-                code = str(code).rjust(3, "0")
-                output.append(f"{code}{value}")
-        self.line_number += 1
-        return "&".join(output)
+                pad = 0
+            plan.append(
+                (
+                    name,
+                    str(code).rjust(3, "0"),
+                    width,
+                    required_type,
+                    pad,
+                    (
+                        getattr(cls, cls.formatters[required_type])
+                        if required_type in cls.formatters
+                        else str
+                    ),
+                )
+            )
+        return tuple(plan)
+
+    @staticmethod
+    def _coerce(name: str, value, required_type: type):
+        if required_type is Decimal and isinstance(value, int):
+            return Decimal(value)
+        elif required_type is str and isinstance(value, int):
+            return str(value)
+        raise ValueError(f"{name}={value} must be of type {required_type}")
 
     def serialize_transaction_pair(self, post_type: str = "NOR", **kwargs):
-        return "\r\n".join(
-            [
-                self.serialize_transaction(post_type, **{**kwargs, "is_debet": debet})
-                for debet in (True, False)
+        return "\r\n".join(self._pair_lines(post_type, **kwargs))
+
+    def serialize_transaction_pairs(self, rows: Iterable[Mapping]) -> Iterator[str]:
+        """Lazily serialize a transaction pair for each row, yielding one line
+        at a time (two per row.) Each row is a dict of the arguments for
+        `serialize_transaction_pair`.
+        """
+        pair_lines = self._pair_lines
+        for row in rows:
+            yield from pair_lines(**row)
+
+    def serialize_columns(
+        self,
+        columns: Mapping[str, Sequence],
+        post_type: str = "NOR",
+        pairs: bool = False,
+    ) -> List[str]:
+        """Serialize a batch of transactions given as columns (lists, tuples,
+        arrays, ...) of equal length, keyed by the names of the arguments to
+        `serialize_transaction` (including aliases.)
+
+        As all transactions have the same fields, the rules for which fields
+        must or may not be given together are checked once for the batch. Each
+        column is then converted, formatted and validated as a whole, and the
+        transactions get consecutive line numbers. If `pairs` is true, a
+        debit/credit pair is serialized for each transaction.
+        Returns one string per transaction, the same as `serialize_transaction`
+        (or `serialize_transaction_pair`).
+        """
+        post_type = self._check_post_type(post_type)
+        columns = dict(columns)
+        lengths = set(map(len, columns.values()))
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        count = lengths.pop() if lengths else 0
+        if not count:
+            return []
+
+        if (pairs and "is_kredit" in columns) or not all(
+            value in config["map"]
+            for alias, config in self.aliases.items()
+            if alias in columns
+            for value in columns[alias]
+        ):
+            # Not all transactions have the same fields (or the same `deb_kred`
+            # on both lines of a pair), so serialize them one by one
+            rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+            if pairs:
+                return [
+                    self.serialize_transaction_pair(post_type, **row) for row in rows
+                ]
+            return [self.serialize_transaction(post_type, **row) for row in rows]
+
+        if pairs:
+            columns["is_debet"] = [True] * count
+        for alias, config in self.aliases.items():
+            if alias in columns:
+                mapping = config["map"]
+                columns[config["field"]] = [mapping[value] for value in columns[alias]]
+
+        plan = self._plan(frozenset(columns))
+        fields = [self._format_column(entry, columns[entry[0]]) for entry in plan]
+        before, after = self._header_parts(post_type)
+        if not pairs:
+            first = self.line_numbers.allocate(count)
+            headers = [
+                before + str(line_number).rjust(5, "0") + after
+                for line_number in range(first, first + count)
             ]
+            return list(map("&".join, zip(headers, *fields)))
+
+        first = self.line_numbers.allocate(2 * count)
+
+        debit_headers = [
+            before + str(line_number).rjust(5, "0") + after
+            for line_number in range(first, first + 2 * count, 2)
+        ]
+        credit_headers = [
+            before + str(line_number).rjust(5, "0") + after
+            for line_number in range(first + 1, first + 2 * count, 2)
+        ]
+        debit_lines = list(map("&".join, zip(debit_headers, *fields)))
+        deb_kred = [entry[0] for entry in plan].index("deb_kred")
+        fields[deb_kred] = [self._credit] * count
+        credit_lines = map("&".join, zip(credit_headers, *fields))
+        return [
+            debit + "\r\n" + credit for debit, credit in zip(debit_lines, credit_lines)
+        ]
+
+    def _format_column(self, entry, column: Sequence) -> List[str]:
+        # Serialized fields ("NNNvalue") for a column of values, like
+        # `_format_fields` does for single values
+        name, code, width, required_type, pad, format_value = entry
+        values = [
+            (
+                value
+                if isinstance(value, required_type)
+                else self._coerce(name, value, required_type)
+            )
+            for value in column
+        ]
+        if required_type is date:
+            # Dates rarely differ within a batch, so format each one once
+            formatted_dates = {value: format_value(value) for value in set(values)}
+            formatted = [formatted_dates[value] for value in values]
+        else:
+            formatted = list(map(format_value, values))
+        for value in formatted:
+            if "&" in value:
+                raise ValueError(f"Value {name}={value} may not contain &")
+        if max(map(len, formatted)) > width:
+            value = next(value for value in formatted if len(value) > width)
+            raise ValueError(f"Value {name}={value} may not exceed length {width}")
+        return [code + value.rjust(pad, "0") for value in formatted]
+
+    def _pair_lines(self, post_type: str = "NOR", **kwargs) -> Tuple[str, str]:
+        # The debit and credit lines of a pair, which only differ in their line
+        # numbers and `deb_kred`. The fields are validated and formatted once.
+        post_type = self._check_post_type(post_type)
+        if "is_kredit" in kwargs:
+            # `is_kredit` overrides `is_debet`, so the lines may not differ in
+            # `deb_kred` at all
+            debit_kwargs = {**kwargs, "is_debet": True}
+            self._resolve_aliases(debit_kwargs)
+            debit_fields = self._format_fields(debit_kwargs)
+            kwargs["is_debet"] = False
+            self._resolve_aliases(kwargs)
+            credit_fields = self._format_fields(kwargs)
+        else:
+            kwargs["is_debet"] = True
+            self._resolve_aliases(kwargs)
+            debit_fields = self._format_fields(kwargs)
+            credit_fields = list(debit_fields)
+            credit_fields[credit_fields.index(self._debit)] = self._credit
+        line_number = self.line_numbers.allocate(2)
+        return (
+            "&".join([self._header(post_type, line_number), *debit_fields]),
+            "&".join([self._header(post_type, line_number + 1), *credit_fields]),
         )
 
+    def serialize_transaction_bytes(
+        self, buffer: PrismeBuffer, post_type: str = "NOR", **kwargs
+    ) -> PrismeBuffer:
+        """Serialize a transaction (taking the same arguments as
+        `serialize_transaction`) and append it to `buffer` in its encoding.
+        """
+        buffer.append(
+            self.serialize_transaction(post_type, **kwargs), self.locate_field
+        )
+        return buffer
+
+    def serialize_transaction_pair_bytes(
+        self, buffer: PrismeBuffer, post_type: str = "NOR", **kwargs
+    ) -> PrismeBuffer:
+        """Serialize a transaction pair (taking the same arguments as
+        `serialize_transaction_pair`) and append it to `buffer` in its encoding.
+        """
+        buffer.append(
+            self.serialize_transaction_pair(post_type, **kwargs), self.locate_field
+        )
+        return buffer
+
+    @classmethod
+    def locate_field(cls, line: str, pos: int) -> str:
+        """Name of the field at position `pos` in a serialized line"""
+        start = line.rfind("&", 0, pos + 1)
+        if start == -1:
+            return "header"
+        return cls.names_by_code.get(int(line[start + 1 : start + 4]), "unknown")
+
     @staticmethod
     def format_timestamp(dt: datetime):
         return "{:0%Y%m%d%H%M}".format(dt)
 
     @staticmethod
     def format_date(d: date):
-        return "{:%Y%m%d}".format(d)
+        return datecodec.format_date(d)
 
     @staticmethod
     def format_omraade_nummer(year):
@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+from threading import Lock
+from typing import Optional
+
+
+class LineNumberAllocator:
+    """Thread-safe source of the line numbers in a G68 or G69 file.
+
+    Numbers are handed out in contiguous blocks with `allocate`, so writers
+    sharing an allocator (or a writer shared between threads) never get the
+    same number. A worker can `reserve` a block of numbers up front, and get
+    them from the returned allocator without contending for the lock of this
+    one. Numbers which are reserved but never used leave a gap in the file,
+    so reserve as many as will be written, e.g. the size of a batch.
+    """
+
+    def __init__(self, first: int = 1, stop: Optional[int] = None):
+        self._next = first
+        self._stop = stop
+        self._lock = Lock()
+
+    @property
+    def next(self) -> int:
+        """The number which will be allocated next"""
+        return self._next
+
+    def reset(self, line_number: int = 1):
+        with self._lock:
+            self._next = line_number
+
+    def allocate(self, count: int = 1) -> int:
+        """Allocate `count` consecutive numbers, returning the first"""
+        with self._lock:
+            start = self._next
+            if self._stop is not None and start + count > self._stop:
+                raise ValueError(
+                    f"Cannot allocate {count} line numbers from {start}, "
+                    f"only numbers below {self._stop} are reserved"
+                )
+            self._next = start + count
+            return start
+
+    def release(self, start: int, count: int = 1) -> bool:
+        """Give back numbers from `allocate` which were not used (e.g. because
+        serialization failed). This only succeeds if they are the most
+        recently allocated numbers, as otherwise it would leave a gap.
+        """
+        with self._lock:
+            if self._next == start + count:
+                self._next = start
+                return True
+            return False
+
+    def reserve(self, count: int) -> "LineNumberAllocator":
+        """Allocate a block of `count` numbers, returned as an allocator
+        handing out only those numbers
+        """
+        start = self.allocate(count)
+        return LineNumberAllocator(start, start + count)
@@ -0,0 +1,161 @@
+# SPDX-FileCopyrightText: 2024 Magenta ApS <info@magenta.dk>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+# Parallel generation of 10Q, G68 and G69 files.
+#
+# The input rows are split into shards, and each shard is serialized by its own
+# writer in a worker process. G68 and G69 line numbers are allocated to the
+# shards up front, so each worker starts numbering where the previous shard
+# ends. The shard outputs are joined in input order, which gives exactly the
+# same output as serializing all rows with a single writer.
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import (
+    IO,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+)
+
+from tenQ.writer.g68 import G68TransactionWriter
+from tenQ.writer.g69 import G69TransactionWriter
+from tenQ.writer.tenq import TenQTransactionWriter
+
+Row = Union[Mapping, Sequence]
+Writer = Union[TenQTransactionWriter, G68TransactionWriter, G69TransactionWriter]
+
+# Number of line numbers used by each call to a writer method
+_line_numbers_used = {
+    (G68TransactionWriter, "serialize_transaction"): 1,
+    (G69TransactionWriter, "serialize_transaction"): 1,
+    (G69TransactionWriter, "serialize_transaction_pair"): 2,
+}
+
+
+def _serialize_shard(
+    writer_class: Type[Writer],
+    writer_kwargs: dict,
+    method: str,
+    first_line_number: int,
+    rows: List[Row],
+) -> str:
+    writer = writer_class(**writer_kwargs)
+    if not isinstance(writer, TenQTransactionWriter):
+        writer.reset_line_number(first_line_number)
+    serialize = getattr(writer, method)
+    return "\r\n".join(
+        serialize(**row) if isinstance(row, Mapping) else serialize(*row)
+        for row in rows
+    )
+
+
+def serialize_parallel(
+    writer_class: Type[Writer],
+    writer_kwargs: dict,
+    rows: Iterable[Row],
+    method: str = "serialize_transaction",
+    processes: Optional[int] = None,
+    shard_size: int = 10_000,
+    first_line_number: int = 1,
+) -> Iterator[str]:
+    """Serialize `rows` with `method` on writers constructed as
+    `writer_class(**writer_kwargs)`, in a pool of `processes` worker processes.
+    Each row holds the arguments for one call to `method`, as a dict or tuple.
+
+    Yields the output of each shard of `shard_size` rows, in input order. Joined
+    with "\\r\\n", the shards are identical to the output of calling `method`
+    on a single writer for each row and joining the results with "\\r\\n".
+    """
+    writer_kwargs = dict(writer_kwargs)
+    if (
+        issubclass(writer_class, TenQTransactionWriter)
+        and writer_kwargs.get("timestamp") is None
+    ):
+        # All shards must use the same timestamp
+        writer_kwargs["timestamp"] = datetime.utcnow().replace(tzinfo=timezone.utc)
+    lines_per_row = 0
+    if not issubclass(writer_class, TenQTransactionWriter):
+        if writer_kwargs.get("line_numbers") is not None:
+            # Each worker numbers its own shard, and an allocator (with its
+            # lock) cannot be sent to the worker processes anyway
+            raise ValueError("A line_numbers allocator cannot be used in parallel")
+        for (cls, name), used in _line_numbers_used.items():
+            if issubclass(writer_class, cls) and method == name:
+                lines_per_row = used
+        if not lines_per_row:
+            # Without it, every shard would restart the numbering
+            raise ValueError(
+                f"Unsupported method {method!r} for {writer_class.__name__}"
+            )
+
+    def shards():
+        line_number = first_line_number
+        shard: List[Row] = []
+        for row in rows:
+            shard.append(row)
+            if len(shard) >= shard_size:
+                yield line_number, shard
+                line_number += len(shard) * lines_per_row
+                shard = []
+        if shard:
+            yield line_number, shard
+
+    # Bound the number of shards in flight, so memory use stays flat
+    max_pending = 2 * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending: Deque[Future] = deque()
+        for line_number, shard in shards():
+            pending.append(
+                executor.submit(
+                    _serialize_shard,
+                    writer_class,
+                    writer_kwargs,
+                    method,
+                    line_number,
+                    shard,
+                )
+            )
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_parallel(
+    writer_class: Type[Writer],
+    writer_kwargs: dict,
+    rows: Iterable[Row],
+    fp: IO[str],
+    method: str = "serialize_transaction",
+    processes: Optional[int] = None,
+    shard_size: int = 10_000,
+    first_line_number: int = 1,
+) -> int:
+    """Like `serialize_parallel`, but write the output to the text file `fp`.
+    Returns the number of shards written.
+    """
+    count = 0
+    for shard in serialize_parallel(
+        writer_class,
+        writer_kwargs,
+        rows,
+        method,
+        processes,
+        shard_size,
+        first_line_number,
+    ):
+        if count:
+            fp.write("\r\n")
+        fp.write(shard)
+        count += 1
+    return count
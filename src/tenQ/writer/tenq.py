@@ -3,8 +3,24 @@
 # SPDX-License-Identifier: MPL-2.0
 
 from datetime import date, datetime, timezone
-
-from tenQ.dates import get_last_payment_date_from_due_date
+from functools import cache, lru_cache
+from typing import (
+    IO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from tenQ import datecodec
+from tenQ.dates import BusinessDayCalendar, get_last_payment_date_from_due_date
+from tenQ.writer.encoding import PRISME_ENCODING, PrismeBuffer, write_lines
 
 
 # Temporary class for serializing transaction data in a writer
@@ -34,6 +50,18 @@ class TenQTransaction(dict):
             self[field_name] = kwargs.get(field_name, default)
         self["trans_type"] = self.trans_type
 
+    @classmethod
+    @cache
+    def field_slices(cls) -> Dict[str, slice]:
+        # Position of each field in a serialized line, derived from the
+        # (ordered) field spec. Computed once per transaction type.
+        slices = {}
+        pos = 0
+        for name, length, default in cls.fieldspec:
+            slices[name] = slice(pos, pos + length)
+            pos += length
+        return slices
+
     def parse(self, line):
         data = {}
         pos = 0
@@ -56,22 +84,24 @@ class TenQTransaction(dict):
         fields = []
 
         for field_name, width, _ in self.serialize_fields:
-            value = data[field_name]
-
-            if value is None:
-                raise ValueError("Value for %s cannot be None" % (field_name))
+            value = self.validate_value(field_name, data[field_name], width)
+            fields.append(value.rjust(width))
 
-            value = str(value)
+        return "".join(fields)
 
-            if len(value) > width:
-                raise ValueError(
-                    "Value '%s' for field %s is wider than %d characters"
-                    % (value, field_name, width)
-                )
+    @staticmethod
+    def validate_value(field_name: str, value, width: int) -> str:
+        if value is None:
+            raise ValueError("Value for %s cannot be None" % (field_name))
 
-            fields.append(value.rjust(width))
+        value = str(value)
 
-        return "".join(fields)
+        if len(value) > width:
+            raise ValueError(
+                "Value '%s' for field %s is wider than %d characters"
+                % (value, field_name, width)
+            )
+        return value
 
     @staticmethod
     def format_timestamp(dt: datetime):
@@ -79,7 +109,7 @@ class TenQTransaction(dict):
 
     @staticmethod
     def format_date(d: date):
-        return "{:%Y%m%d}".format(d)
+        return datecodec.format_date(d)
 
     @staticmethod
     def format_omraade_nummer(nummer):
@@ -91,6 +121,12 @@ class TenQTransaction(dict):
         sign = "-" if amount < 0 else "+"
         return str(abs(amount)).rjust(10, "0") + sign
 
+    @staticmethod
+    def parse_amount(value: str) -> int:
+        # Inverse of `format_amount`: amount in øre, with the sign as the last character
+        amount = int(value[:-1])
+        return -amount if value[-1] == "-" else amount
+
     @staticmethod
     def format_nummer(nummer, width):
         # Efter aftale anvendes skatteaaret som omraadenummer
@@ -163,6 +199,109 @@ class TenQFixWidthFieldLineTransactionType52(TenQTransaction):
     trans_type = 52
 
 
+class TenQRow(NamedTuple):
+    """The arguments for one call to `TenQTransactionWriter.serialize_transaction`.
+
+    A row takes somewhat less memory than the equivalent dict (about 15% less
+    per pending transaction, see `benchmarks/bench_tenq_memory.py`.) Rows can
+    be passed to `TenQTransactionWriter.serialize_transactions` and
+    `write_transactions` as is.
+    """
+
+    cpr_nummer: str
+    amount_in_dkk: int
+    afstem_noegle: str
+    rate_text: str
+    sag_nummer: int = 0
+    individ_type: int = 20
+    rate_nummer: int = 999
+    belob_type: int = 1
+    rentefri_beloeb: int = 0
+    opkraev_kode: int = 1
+    ean_lokationsnummer: str = ""
+
+
+class TenQLineSerializer:
+    """Serializer for a single line type, compiled from a `TenQTransaction`.
+
+    The values of all fields except `variable_fields` are taken from the
+    transaction (or `constants`), validated and padded once, and baked into a format string.
+    Serializing a line then only validates the variable fields and formats
+    them into the string in one operation. The output is identical to that of
+    `TenQTransaction.serialize_transaction`.
+    """
+
+    __slots__ = ("_format", "_fields", "_rate_text")
+
+    def __init__(
+        self,
+        transaction: TenQTransaction,
+        variable_fields,
+        constants: Dict[str, object] = None,
+    ):
+        # `constants` overrides the values in `transaction`
+        data = {**transaction, **(constants or {})}
+        parts = []
+        fields = []
+        for field_name, width, _ in transaction.serialize_fields:
+            if field_name in variable_fields:
+                parts.append("{:>%d}" % width)
+                fields.append((field_name, width))
+            else:
+                value = TenQTransaction.validate_value(
+                    field_name, data[field_name], width
+                )
+                parts.append(value.rjust(width).replace("{", "{{").replace("}", "}}"))
+        # Type 26 lines end with the (unpadded) rate text
+        self._rate_text = isinstance(
+            transaction, TenQFixWidthFieldLineTransactionType26
+        )
+        if self._rate_text:
+            parts.append("{}")
+        self._format = "".join(parts).format
+        self._fields = tuple(fields)
+
+    def serialize(self, data: dict) -> str:
+        values = []
+        for field_name, width in self._fields:
+            value = data[field_name]
+            if value is None:
+                raise ValueError("Value for %s cannot be None" % (field_name))
+            value = str(value)
+            if len(value) > width:
+                raise ValueError(
+                    "Value '%s' for field %s is wider than %d characters"
+                    % (value, field_name, width)
+                )
+            values.append(value)
+        if self._rate_text:
+            values.append(data["rate_text"][:60])
+        return self._format(*values)
+
+    def serialize_columns(self, columns: Mapping[str, Sequence]) -> List[str]:
+        """Serialize one line for each row in `columns`, which holds a sequence
+        of values for each variable field. Each column is validated as a whole.
+        """
+        values = []
+        for field_name, width in self._fields:
+            column = columns[field_name]
+            if None in column:
+                raise ValueError("Value for %s cannot be None" % (field_name))
+            column = list(map(str, column))
+            if column and max(map(len, column)) > width:
+                value = next(value for value in column if len(value) > width)
+                raise ValueError(
+                    "Value '%s' for field %s is wider than %d characters"
+                    % (value, field_name, width)
+                )
+            values.append(column)
+        if self._rate_text:
+            values.append([text[:60] for text in columns["rate_text"]])
+        if not values:
+            raise ValueError("No variable fields to serialize")
+        return list(map(self._format, *values))
+
+
 class TenQTransactionWriter(object):
     transaction_10 = None
     transaction_24 = None
@@ -170,6 +309,33 @@ class TenQTransactionWriter(object):
     transaction_52 = None
     transaction_list = ""
 
+    # Fields which may differ between calls to `serialize_transaction`
+    variable_fields = frozenset(
+        (
+            "debitor_nummer",
+            "person_nummer",
+            "sag_nummer",
+            "individ_type",
+            "rate_nummer",
+            "rate_beloeb",
+            "belob_type",
+            "rentefri_beloeb",
+            "opkraev_kode",
+            "afstem_noegle",
+            "line_number",
+            "ean_lokationsnummer",
+        )
+    )
+
+    # Defaults of the optional arguments to `serialize_transaction` which go
+    # into the type 24 line. When they are all left at their defaults (which is
+    # almost always), the lines are serialized by `default_line_serializers`,
+    # where these are rendered as constants.
+    default_args = (0, 20, 999, 1, 0, 1)
+
+    # Number of distinct rate texts whose type 26 lines are kept rendered
+    rate_text_cache_size = 1024
+
     def __init__(
         self,
         due_date: date,
@@ -187,6 +353,7 @@ class TenQTransactionWriter(object):
         interest_date: date = None,
         omraade_nummer: int = None,
         ean_lokationsnummer: str = None,
+        calendar: BusinessDayCalendar = None,
     ):
         if timestamp is None:
             timestamp = datetime.utcnow().replace(tzinfo=timezone.utc)
@@ -205,7 +372,7 @@ class TenQTransactionWriter(object):
         if omraade_nummer is None:
             omraade_nummer = year
         if last_payment_date is None:
-            last_payment_date = get_last_payment_date_from_due_date(due_date)
+            last_payment_date = get_last_payment_date_from_due_date(due_date, calendar)
         if opkraev_date is None:
             opkraev_date = last_payment_date
         if interest_date is None:
@@ -244,6 +411,47 @@ class TenQTransactionWriter(object):
             "52": self.transaction_52,
         }
 
+        # Compiled on first use, so invalid init data is reported by
+        # `serialize_transaction` like it has always been
+        self._line_serializers = None
+        self._default_line_serializers = None
+        self._rate_text_lines = lru_cache(maxsize=self.rate_text_cache_size)(
+            self._render_rate_text_lines
+        )
+
+    @property
+    def line_serializers(self):
+        if self._line_serializers is None:
+            self._line_serializers = {
+                trans_type: TenQLineSerializer(transaction, self.variable_fields)
+                for trans_type, transaction in self.transaction_map.items()
+            }
+        return self._line_serializers
+
+    @property
+    def default_line_serializers(self):
+        if self._default_line_serializers is None:
+            constants = self.format_optional_args(*self.default_args)
+            variable_fields = self.variable_fields - constants.keys()
+            self._default_line_serializers = {
+                trans_type: TenQLineSerializer(transaction, variable_fields, constants)
+                for trans_type, transaction in self.transaction_map.items()
+            }
+        return self._default_line_serializers
+
+    @staticmethod
+    def format_optional_args(
+        sag_nummer, individ_type, rate_nummer, belob_type, rentefri_beloeb, opkraev_kode
+    ) -> Dict[str, object]:
+        return {
+            "sag_nummer": TenQTransaction.format_nummer(sag_nummer, 2),
+            "individ_type": TenQTransaction.format_nummer(individ_type, 2),
+            "rate_nummer": TenQTransaction.format_nummer(rate_nummer, 3),
+            "belob_type": belob_type,
+            "rentefri_beloeb": TenQTransaction.format_amount(rentefri_beloeb),
+            "opkraev_kode": opkraev_kode,
+        }
+
     def parse(self, text):
         data = []
         for line in text.split("\r\n"):
@@ -252,7 +460,7 @@ class TenQTransactionWriter(object):
                 data.append(transaction_object.parse(line))
         return data
 
-    def serialize_transaction(
+    def serialize_transaction_lines(
         self,
         cpr_nummer: str,
         amount_in_dkk: int,
@@ -265,36 +473,234 @@ class TenQTransactionWriter(object):
         rentefri_beloeb: int = 0,
         opkraev_kode: int = 1,
         ean_lokationsnummer: str = "",
-    ):
+    ) -> List[str]:
+        cpr_nummer = str(cpr_nummer).zfill(10)
         data = {
-            "cpr_nummer": cpr_nummer,
+            "debitor_nummer": cpr_nummer,
+            "person_nummer": cpr_nummer,
             "rate_beloeb": TenQTransaction.format_amount(
                 amount_in_dkk * 100
             ),  # Amount is in øre, so multiply by 100
             "afstem_noegle": afstem_noegle,
-            "sag_nummer": TenQTransaction.format_nummer(sag_nummer, 2),
-            "individ_type": TenQTransaction.format_nummer(individ_type, 2),
-            "rate_nummer": TenQTransaction.format_nummer(rate_nummer, 3),
-            "belob_type": belob_type,
-            "rentefri_beloeb": TenQTransaction.format_amount(rentefri_beloeb),
-            "opkraev_kode": opkraev_kode,
             "ean_lokationsnummer": ean_lokationsnummer,
         }
+        optional_args = (
+            sag_nummer,
+            individ_type,
+            rate_nummer,
+            belob_type,
+            rentefri_beloeb,
+            opkraev_kode,
+        )
+        # Only use the pre-rendered defaults for actual ints, as e.g. `True == 1`
+        # but is serialized differently
+        if optional_args == self.default_args and all(
+            type(arg) is int for arg in optional_args
+        ):
+            serializers = self.default_line_serializers
+            result_lines = [
+                serializers["10"].serialize(data),
+                serializers["24"].serialize(data),
+            ]
+            # The type 10 line has validated that the CPR number fits in 10
+            # characters, and it has been zero-filled to at least 10
+            head, tails = self._rate_text_lines(rate_text)
+            result_lines.extend([head + cpr_nummer + tail for tail in tails])
+            if ean_lokationsnummer:
+                result_lines.append(serializers["52"].serialize(data))
+            return result_lines
+
+        data.update(self.format_optional_args(*optional_args))
+        return self._serialize_lines(
+            self.line_serializers, data, rate_text, ean_lokationsnummer
+        )
+
+    def _render_rate_text_lines(self, rate_text: str) -> Tuple[str, Tuple[str, ...]]:
+        # Render the type 26 lines for `rate_text` with the default arguments,
+        # split around the debitor number, which is the only part that differs
+        # between transactions. Cached per rate text in `_rate_text_lines`.
+        debitor = TenQFixWidthFieldLineTransactionType26.field_slices()[
+            "debitor_nummer"
+        ]
+        serializer_26 = self.default_line_serializers["26"]
+        data = {"debitor_nummer": "0" * (debitor.stop - debitor.start)}
+        lines = []
+        for line_nr, line in enumerate(rate_text.splitlines(), 1):
+            data["line_number"] = str(line_nr).rjust(3, "0")
+            data["rate_text"] = line
+            lines.append(serializer_26.serialize(data))
+        head = lines[0][: debitor.start] if lines else ""
+        return head, tuple(line[debitor.stop :] for line in lines)
+
+    @staticmethod
+    def _serialize_lines(serializers, data, rate_text, ean_lokationsnummer):
         # Initial two lines
         result_lines = [
-            self.transaction_10.serialize_transaction(**data),
-            self.transaction_24.serialize_transaction(**data),
+            serializers["10"].serialize(data),
+            serializers["24"].serialize(data),
         ]
         # One type 26 line for each line in the rate text.
+        serializer_26 = serializers["26"]
         for line_nr, line in enumerate(rate_text.splitlines(), 1):
-            result_lines.append(
-                self.transaction_26.serialize_transaction(
-                    line_number=str(line_nr).rjust(3, "0"), rate_text=line, **data
+            data["line_number"] = str(line_nr).rjust(3, "0")
+            data["rate_text"] = line
+            result_lines.append(serializer_26.serialize(data))
+        if ean_lokationsnummer:
+            result_lines.append(serializers["52"].serialize(data))
+        return result_lines
+
+    def serialize_transaction(
+        self,
+        cpr_nummer: str,
+        amount_in_dkk: int,
+        afstem_noegle: str,
+        rate_text: str,
+        sag_nummer: int = 0,
+        individ_type: int = 20,
+        rate_nummer: int = 999,
+        belob_type: int = 1,
+        rentefri_beloeb: int = 0,
+        opkraev_kode: int = 1,
+        ean_lokationsnummer: str = "",
+    ) -> str:
+        return "\r\n".join(
+            self.serialize_transaction_lines(
+                cpr_nummer,
+                amount_in_dkk,
+                afstem_noegle,
+                rate_text,
+                sag_nummer,
+                individ_type,
+                rate_nummer,
+                belob_type,
+                rentefri_beloeb,
+                opkraev_kode,
+                ean_lokationsnummer,
+            )
+        )
+
+    def serialize_transactions(
+        self, rows: Iterable[Union[Mapping, Sequence]]
+    ) -> Iterator[str]:
+        """Lazily serialize many transactions, yielding one line at a time
+        (without line endings.) Each row holds the arguments for
+        `serialize_transaction`, either as a dict or a tuple such as `TenQRow`.
+        """
+        serialize = self.serialize_transaction_lines
+        for row in rows:
+            if isinstance(row, Mapping):
+                yield from serialize(**row)
+            else:
+                yield from serialize(*row)
+
+    def write_transactions(
+        self,
+        rows: Iterable[Union[Mapping, Sequence]],
+        fp: IO,
+        buffer_size: int = 65536,
+        encoding: str = PRISME_ENCODING,
+    ) -> int:
+        """Serialize many transactions directly to the file object `fp`.
+        The output is the same as joining the results of `serialize_transaction`
+        with "\\r\\n". Lines are collected in a buffer of about `buffer_size`
+        characters before being written. If `fp` is a binary file, the output is
+        encoded with `encoding`.
+        Returns the number of lines written.
+        """
+        return write_lines(
+            self.serialize_transactions(rows),
+            fp,
+            self.locate_field,
+            buffer_size,
+            encoding,
+        )
+
+    def serialize_transaction_bytes(
+        self, buffer: PrismeBuffer, *args, **kwargs
+    ) -> PrismeBuffer:
+        """Serialize a transaction (taking the same arguments as
+        `serialize_transaction`) and append it to `buffer` in its encoding.
+        """
+        buffer.append(self.serialize_transaction(*args, **kwargs), self.locate_field)
+        return buffer
+
+    def locate_field(self, line: str, pos: int) -> str:
+        """Name of the field at position `pos` in a serialized line"""
+        transaction = self.transaction_map.get(line[4:6])
+        if transaction is not None:
+            for field_name, slc in transaction.field_slices().items():
+                if slc.start <= pos < slc.stop:
+                    return field_name
+        return "unknown"
+
+    def serialize_columns(
+        self,
+        cpr_nummer: Sequence,
+        amount_in_dkk: Sequence,
+        afstem_noegle: Sequence,
+        rate_text: Sequence,
+        ean_lokationsnummer: Optional[Sequence] = None,
+    ) -> List[str]:
+        """Serialize a batch of transactions given as columns (lists, tuples,
+        arrays, ...) of equal length, rather than one row at a time. The optional
+        arguments of `serialize_transaction` are left at their defaults.
+
+        The CPR numbers and amounts are formatted and validated column by column,
+        and the type 10, 24 and 52 lines are built in bulk. The type 26 lines
+        depend on the number of lines in each rate text, and are built one
+        transaction at a time from the cached lines of the rate text.
+        Returns one string per transaction, the same as `serialize_transaction`.
+        """
+        cprs = [str(cpr).zfill(10) for cpr in cpr_nummer]
+        # Same as `TenQTransaction.format_amount`, with the amount in øre
+        amounts = [
+            str(abs(amount * 100)).rjust(10, "0") + ("-" if amount < 0 else "+")
+            for amount in amount_in_dkk
+        ]
+        eans = [""] * len(cprs) if ean_lokationsnummer is None else ean_lokationsnummer
+        if not (
+            len(cprs)
+            == len(amounts)
+            == len(afstem_noegle)
+            == len(rate_text)
+            == len(eans)
+        ):
+            raise ValueError("All columns must have the same length")
+
+        columns = {
+            "debitor_nummer": cprs,
+            "person_nummer": cprs,
+            "rate_beloeb": amounts,
+            "afstem_noegle": afstem_noegle,
+        }
+        serializers = self.default_line_serializers
+        lines_10 = serializers["10"].serialize_columns(columns)
+        lines_24 = serializers["24"].serialize_columns(columns)
+        with_ean = [i for i, ean in enumerate(eans) if ean]
+        lines_52 = dict(
+            zip(
+                with_ean,
+                serializers["52"].serialize_columns(
+                    {
+                        "debitor_nummer": [cprs[i] for i in with_ean],
+                        "person_nummer": [cprs[i] for i in with_ean],
+                        "ean_lokationsnummer": [eans[i] for i in with_ean],
+                    }
                 ),
             )
-        if ean_lokationsnummer:
-            result_lines.append(self.transaction_52.serialize_transaction(**data))
-        return "\r\n".join(result_lines)
+        )
+
+        result = []
+        for i, (line_10, line_24, cpr, text) in enumerate(
+            zip(lines_10, lines_24, cprs, rate_text)
+        ):
+            result_lines = [line_10, line_24]
+            head, tails = self._rate_text_lines(text)
+            result_lines.extend([head + cpr + tail for tail in tails])
+            if i in lines_52:
+                result_lines.append(lines_52[i])
+            result.append("\r\n".join(result_lines))
+        return result
 
 
 # afstem_noegle = '44edf2b0-9e2d-40fa-8087-cb37cfbdb66'  # SET PROPERTY HERE Skal vaere unik pr. dataleverandoer identifikation og pr. G19-transaktiontype og pr. kommune (hordcoded based on random uuid)